@@ -24,6 +24,7 @@ from util import *
 import time, os
 import traceback
 import sys
+import random
 
 #######################
 # Parts worth reading #
@@ -161,9 +162,15 @@ class AgentState:
 
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans backed by a single int, with bit
+    x * height + y set where grid[x][y] is True.  Data is accessed via
+    grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
+    y vertical and the origin (0,0) in the bottom left corner; grid[x] is a
+    GridColumn that reads and writes the bits of column x, made the first
+    time the column is used.
+
+    Since ints are immutable, copy only shares the int, hashing and comparing
+    grids hash and compare one int, and count is a popcount.
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
@@ -173,57 +180,90 @@ class Grid:
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(height)] for x in range(width)]
+        self.bits = (1 << (width * height)) - 1 if initialValue else 0
+        self.columns = None
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        columns = self.columns
+        if columns is None:
+            columns = self.columns = [None] * self.width
+        column = columns[i]
+        if column is None:
+            column = columns[i] = GridColumn(self, i % self.width * self.height)
+        return column
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        column = self[key]
+        for y in range(self.height):
+            column[y] = item[y]
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out = [[str(self[x][y])[0] for x in range(self.width)] for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
 
     def __eq__(self, other):
         if other == None: return False
-        return self.data == other.data
+        return (self.width, self.height, self.bits) == (other.width, other.height, other.bits)
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(self.bits)
+
+    def __getstate__(self):
+        "Pickles a grid of booleans compactly, as its size and one bit per cell"
+        return (self.width, self.height, self.bits)
+
+    def __setstate__(self, state):
+        self.CELLS_PER_INT = 30
+        self.columns = None
+        if isinstance(state, dict): # Pickled before grids were packed
+            data = state.pop('data')
+            self.__dict__.update(state)
+            self.bits = 0
+            for x, column in enumerate(data):
+                self[x] = column
+            return
+        self.width, self.height, self.bits = state
+
+    def packInt(self):
+        "Returns a grid of booleans as an int with bit x * height + y set where grid[x][y]"
+        return self.bits
 
     def copy(self):
         g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g.bits = self.bits
         return g
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        return self.copy()
 
     def count(self, item =True ):
-        return sum([x.count(item) for x in self.data])
+        trueCount = bin(self.bits).count('1')
+        if item == True:
+            return trueCount
+        if item == False:
+            return self.width * self.height - trueCount
+        return 0
 
     def asList(self, key = True):
+        if key == True:
+            bits = self.bits
+        elif key == False:
+            bits = ~self.bits & ((1 << (self.width * self.height)) - 1)
+        else:
+            return []
+        cells = bin(bits)[:1:-1]
+        height = self.height
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key: list.append( (x,y) )
+        index = cells.find('1')
+        while index >= 0:
+            list.append(divmod(index, height))
+            index = cells.find('1', index + 1)
         return list
 
     def packBits(self):
@@ -274,6 +314,73 @@ class Grid:
                 bools.append(False)
         return bools
 
+class GridColumn(object):
+    """
+    A view of one column of a Grid, returned by grid[x], that reads and writes
+    the grid's bits.  Columns iterate, index, slice and compare equal like
+    lists of booleans, though slices are new lists rather than views.
+    """
+    __slots__ = ('grid', 'offset')
+    __hash__ = None
+
+    def __init__(self, grid, offset):
+        self.grid = grid
+        self.offset = offset
+
+    def __getitem__(self, y):
+        grid = self.grid
+        if 0 <= y < grid.height:
+            return (grid.bits >> (self.offset + y)) & 1 == 1
+        if isinstance(y, slice):
+            return [self[i] for i in range(*y.indices(grid.height))]
+        if not -grid.height <= y < 0:
+            raise IndexError('grid index out of range')
+        return (grid.bits >> (self.offset + y + grid.height)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        if value not in [False, True]: raise Exception('Grids can only contain booleans')
+        height = self.grid.height
+        if not 0 <= y < height:
+            if not -height <= y < 0:
+                raise IndexError('grid index out of range')
+            y += height
+        bit = 1 << (self.offset + y)
+        if value:
+            self.grid.bits |= bit
+        else:
+            self.grid.bits &= ~bit
+
+    def __len__(self):
+        return self.grid.height
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+def gridFromInt(width, height, bits):
+    "Returns the Grid that packInt turned into bits"
+    grid = Grid(width, height)
+    grid.bits = bits
+    return grid
+
+ZOBRIST_KEYS = []
+_zobristRandom = random.Random(0)
+
+def getZobristKey(index):
+    """
+    Returns the random key of feature number index for Zobrist hashing.  Keys
+    come from a generator of their own, so they are the same in every run and
+    drawing them does not disturb the game's random choices.
+    """
+    while len(ZOBRIST_KEYS) <= index:
+        ZOBRIST_KEYS.append(_zobristRandom.getrandbits(62))
+    return ZOBRIST_KEYS[index]
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
         return bitRep
@@ -376,14 +483,19 @@ class GameStateData:
         """
         Generates a new data packet by copying information from its predecessor.
         """
-        if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
+        if prevState is not None:
+            self.food = prevState.food # Shared until PacmanRules.consume eats a pellet
+            self.numFood = prevState.numFood
+            self.capsules = prevState.capsules # Likewise for capsules
             self.agentStates = self.copyAgentStates( prevState.agentStates )
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self.zobrist = prevState.zobrist
+        self.resetMoveInfo()
 
+    def resetMoveInfo( self ):
+        "Forgets what the last move changed, before the next one is applied"
         self._foodEaten = None
         self._foodAdded = None
         self._capsuleEaten = None
@@ -395,7 +507,8 @@ class GameStateData:
     def deepCopy( self ):
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        state.capsules = self.capsules[:]
+        state.layout = self.layout.copy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -423,24 +536,59 @@ class GameStateData:
     def __hash__( self ):
         """
         Allows states to be keys of dictionaries.
+
+        The food, capsules and agent states are hashed Zobrist-style: zobrist is
+        the exclusive or of a key for each food pellet and capsule and one for
+        each agent state, and the game rules update it as they change them (see
+        toggleFood, toggleCapsule and toggleAgent), so hashing is O(1).
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError, e:
-                print e
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        return self.zobrist ^ hash(self.score)
+
+    def getFoodKey( self, position ):
+        x, y = position
+        return getZobristKey(x * self.layout.height + y)
+
+    def getCapsuleKey( self, position ):
+        x, y = position
+        return getZobristKey((self.layout.width + x) * self.layout.height + y)
+
+    def getAgentKey( self, agentIndex ):
+        agentState = self.agentStates[agentIndex]
+        return hash((agentIndex, agentState.configuration, agentState.scaredTimer))
+
+    def toggleFood( self, position ):
+        "Adds the pellet at position to the hash, or removes it if it was there"
+        self.zobrist ^= self.getFoodKey(position)
+
+    def toggleCapsule( self, position ):
+        "Adds the capsule at position to the hash, or removes it if it was there"
+        self.zobrist ^= self.getCapsuleKey(position)
+
+    def toggleAgent( self, agentIndex ):
+        """
+        Removes an agent's state from the hash, or adds it back.  Call it once
+        before changing the agent's configuration or scaredTimer and once after.
+        """
+        self.zobrist ^= self.getAgentKey(agentIndex)
+
+    def computeZobrist( self ):
+        "Returns the zobrist value of the state, computed from scratch"
+        zobrist = 0
+        for position in self.food.asList():
+            zobrist ^= self.getFoodKey(position)
+        for position in self.capsules:
+            zobrist ^= self.getCapsuleKey(position)
+        for agentIndex in range(len(self.agentStates)):
+            zobrist ^= self.getAgentKey(agentIndex)
+        return zobrist
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
         if type(self.food) == type((1,2)):
             self.food = reconstituteGrid(self.food)
-        for x in range(width):
-            for y in range(height):
-                food, walls = self.food, self.layout.walls
-                map[x][y] = self._foodWallStr(food[x][y], walls[x][y])
+        food, walls = self.food, self.layout.walls
+        map = [[self._foodWallStr(food[x][y], walls[x][y]) for y in range(height)]
+               for x in range(width)]
 
         for agentState in self.agentStates:
             if agentState == None: continue
@@ -455,7 +603,9 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        out = [''.join([map[x][y] for x in range(width)]) for y in range(height)]
+        out.reverse()
+        return '\n'.join(out) + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr( self, hasFood, hasWall ):
         if hasFood:
@@ -489,6 +639,7 @@ class GameStateData:
         Creates an initial game state from a layout array (see layout.py).
         """
         self.food = layout.food.copy()
+        self.numFood = self.food.count()
         #self.capsules = []
         self.capsules = layout.capsules[:]
         self.layout = layout
@@ -503,6 +654,7 @@ class GameStateData:
                 else: numGhosts += 1
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
         self._eaten = [False for a in self.agentStates]
+        self.zobrist = self.computeZobrist()
 
 try:
     import boinc
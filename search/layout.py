@@ -14,10 +14,18 @@
 
 from util import manhattanDistance
 from game import Grid
+from game import Actions
+from game import Directions
+import array
+import copy
+import hashlib
 import os
 import random
+import sys
 
 VISIBILITY_MATRIX_CACHE = {}
+MAZE_DISTANCES_CACHE = {}
+ACTION_TABLES_CACHE = {}
 
 class Layout:
     """
@@ -35,6 +43,7 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        self.initializeActionTables()
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
@@ -61,6 +70,62 @@ class Layout:
         else:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
 
+    def initializeActionTables(self):
+        """
+        Builds tables, indexed by x * height + y, of what can be done from every
+        cell of the layout: possibleActions holds the actions that
+        Actions.getPossibleActions allows at the cell, in its order and with
+        Stop, and moves the (action, nextCell) pairs that the search problems
+        expand, in North, South, East, West order.  Cells off the grid count as
+        walls.  The tables are built once per set of walls and shared by all
+        layouts with those walls; actionTableWalls records which walls they
+        were built from.
+        """
+        key = (self.width, self.height, self.walls.packInt())
+        if key not in ACTION_TABLES_CACHE:
+            width, height, walls = self.width, self.height, self.walls
+            def isOpen(x, y):
+                return 0 <= x < width and 0 <= y < height and not walls[x][y]
+
+            possibleActions, moves = [], []
+            for x in range(width):
+                for y in range(height):
+                    possibleActions.append(tuple([direction for direction, (dx, dy) in Actions._directionsAsList
+                                                  if isOpen(x + dx, y + dy)]))
+                    cellMoves = []
+                    for direction in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+                        dx, dy = Actions._directions[direction]
+                        if isOpen(x + dx, y + dy):
+                            cellMoves.append((direction, (x + dx, y + dy)))
+                    moves.append(tuple(cellMoves))
+            ACTION_TABLES_CACHE[key] = (possibleActions, moves)
+        self.possibleActions, self.moves = ACTION_TABLES_CACHE[key]
+        self.actionTableWalls = key[2]
+
+    def getPossibleActions(self, config):
+        "Returns Actions.getPossibleActions(config, self.walls), from the table"
+        x, y = config.pos
+        x_int, y_int = int(x + 0.5), int(y + 0.5)
+
+        # In between grid points, all agents must continue straight
+        if (abs(x - x_int) + abs(y - y_int)  > Actions.TOLERANCE):
+            return [config.getDirection()]
+        return list(self.possibleActions[x_int * self.height + y_int])
+
+    def getMoves(self, position):
+        "Returns the (action, nextCell) pairs of the moves out of a cell"
+        x, y = position
+        return self.moves[x * self.height + y]
+
+    def getMazeDistances(self):
+        "Returns the MazeDistances of this layout's walls, computing them at most once"
+        if getattr(self, 'mazeDistances', None) is None:
+            key = MazeDistances.getKey(self.walls)
+            if key not in MAZE_DISTANCES_CACHE:
+                MAZE_DISTANCES_CACHE[key] = MazeDistances(self.walls)
+            self.mazeDistances = MAZE_DISTANCES_CACHE[key]
+        return self.mazeDistances
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -92,6 +157,20 @@ class Layout:
     def deepCopy(self):
         return Layout(self.layoutText[:])
 
+    def copy(self):
+        """
+        Returns a copy of the layout without parsing its text again, as deepCopy
+        does.  The text and the tables built from the walls are never changed,
+        so they are shared; the grids and lists are copied, which for grids is
+        O(1) because they only share an int until one of them is written to.
+        """
+        layout = copy.copy(self)
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        return layout
+
     def processLayoutText(self, layoutText):
         """
         Coordinates are flipped from the input format to the (x,y) convention here
@@ -128,6 +207,107 @@ class Layout:
         elif layoutChar in  ['1', '2', '3', '4']:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
+class MazeDistances:
+    """
+    The maze distance between every pair of open cells of a set of walls, found
+    with one breadth-first search per cell and kept in a single array of
+    unsigned shorts, so that getDistance is two dict lookups and an index.
+
+    The table is saved in cacheDirectory, which belongs to the user, under a
+    hash of the walls and read back from there by later runs, on any layout
+    with the same walls.  Each file starts with a header line naming the hash,
+    the number of cells and the byte order, and a file whose header or length
+    does not match is ignored, as is a cache that cannot be read or written.
+    """
+    cacheDirectory = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                                  'pacmanMazeDistances')
+    UNREACHABLE = 0xFFFF
+
+    def __init__(self, walls):
+        self.cells = [(x, y) for x in range(walls.width) for y in range(walls.height) if not walls[x][y]]
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.key = self.getKey(walls)
+        self.distances = self.load()
+        if self.distances is None:
+            self.distances = self.computeDistances()
+            self.save()
+
+    def getKey(walls):
+        "Returns a hex digest that identifies a wall grid"
+        return hashlib.sha1('%d %d %d' % (walls.width, walls.height, walls.packInt())).hexdigest()
+    getKey = staticmethod(getKey)
+
+    def getDistance(self, pos1, pos2):
+        """
+        Returns the maze distance between two open cells, or None if there is no
+        path between them.  Raises KeyError if either one is a wall.
+        """
+        distance = self.distances[self.index[pos1] * len(self.cells) + self.index[pos2]]
+        if distance == self.UNREACHABLE:
+            return None
+        return distance
+
+    def computeDistances(self):
+        cells, index, size = self.cells, self.index, len(self.cells)
+        neighbors = []
+        for x, y in cells:
+            adjacent = [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]
+            neighbors.append([index[cell] for cell in adjacent if cell in index])
+
+        unreachable = self.UNREACHABLE
+        distances = array.array('H', [unreachable]) * (size * size)
+        for source in xrange(size):
+            row = source * size
+            distances[row + source] = 0
+            layer, distance = [source], 0
+            while layer:
+                distance += 1
+                nextLayer = []
+                for cell in layer:
+                    for neighbor in neighbors[cell]:
+                        if distances[row + neighbor] == unreachable:
+                            distances[row + neighbor] = distance
+                            nextLayer.append(neighbor)
+                layer = nextLayer
+        return distances
+
+    def getCachePath(self):
+        return os.path.join(self.cacheDirectory, self.key + '.dist')
+
+    def getCacheHeader(self):
+        return 'MazeDistances %s %d %s\n' % (self.key, len(self.cells), sys.byteorder)
+
+    def load(self):
+        "Returns the cached distance table, or None if there is no usable one"
+        distances = array.array('H')
+        try:
+            f = open(self.getCachePath(), 'rb')
+            try:
+                if f.readline() != self.getCacheHeader():
+                    return None
+                distances.fromfile(f, len(self.cells) ** 2)
+                if f.read(1):
+                    return None
+            finally: f.close()
+        except (IOError, OSError, EOFError):
+            return None
+        return distances
+
+    def save(self):
+        path = self.getCachePath()
+        partPath = '%s.%d' % (path, os.getpid())
+        try:
+            if not os.path.isdir(self.cacheDirectory):
+                os.makedirs(self.cacheDirectory, 0700)
+            f = open(partPath, 'wb')
+            try:
+                f.write(self.getCacheHeader())
+                self.distances.tofile(f)
+            finally: f.close()
+            os.rename(partPath, path)
+        except (IOError, OSError):
+            pass
+
 def getLayout(name, back = 2):
     if name.endswith('.lay'):
         layout = tryToLoad('layouts/' + name)
@@ -43,6 +43,7 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import Configuration
 from util import nearestPoint
 from util import manhattanDistance
 import util, layout
@@ -100,29 +101,69 @@ class GameState:
 
         # Copy current state
         state = GameState(self)
+        state._applyRules( agentIndex, action )
+        GameState.explored.add(self)
+        GameState.explored.add(state)
+        return state
+
+    def apply( self, agentIndex, action ):
+        """
+        Makes the specified agent take the action in this state itself, by the
+        same rules as generateSuccessor, and returns a record for undo.  This
+        allocates no new states, so lookahead can apply a move, look at the
+        result and undo it again.  Undo records must be undone in the reverse
+        order of the moves; states changed this way are not added to explored.
+        """
+        if self.isWin() or self.isLose(): raise Exception('Can\'t generate a successor of a terminal state.')
 
+        data = self.data
+        record = (data.food, data.numFood, data.capsules, data._eaten, data.score, data.scoreChange, data.zobrist,
+                  data._foodEaten, data._foodAdded, data._capsuleEaten, data._agentMoved, data._lose, data._win,
+                  [(agentState.configuration, agentState.scaredTimer) for agentState in data.agentStates])
+        data.resetMoveInfo()
+        try:
+            self._applyRules( agentIndex, action )
+        except:
+            self.undo( record )
+            raise
+        return record
+
+    def undo( self, record ):
+        """
+        Restores the state to what it was before the apply call that returned
+        record.
+        """
+        data = self.data
+        (data.food, data.numFood, data.capsules, data._eaten, data.score, data.scoreChange, data.zobrist,
+         data._foodEaten, data._foodAdded, data._capsuleEaten, data._agentMoved, data._lose, data._win,
+         agents) = record
+        for agentState, (configuration, scaredTimer) in zip(data.agentStates, agents):
+            agentState.configuration = configuration
+            agentState.scaredTimer = scaredTimer
+
+    def _applyRules( self, agentIndex, action ):
+        "Applies an agent's action to this state, for generateSuccessor and apply"
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
-            state.data._eaten = [False for i in range(state.getNumAgents())]
-            PacmanRules.applyAction( state, action )
+            self.data._eaten = [False for i in range(self.getNumAgents())]
+            PacmanRules.applyAction( self, action )
         else:                # A ghost is moving
-            GhostRules.applyAction( state, action, agentIndex )
+            GhostRules.applyAction( self, action, agentIndex )
 
         # Time passes
         if agentIndex == 0:
-            state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
+            self.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            self.data.toggleAgent( agentIndex )
+            GhostRules.decrementTimer( self.data.agentStates[agentIndex] )
+            self.data.toggleAgent( agentIndex )
 
         # Resolve multi-agent effects
-        GhostRules.checkDeath( state, agentIndex )
+        GhostRules.checkDeath( self, agentIndex )
 
         # Book keeping
-        state.data._agentMoved = agentIndex
-        state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
-        return state
+        self.data._agentMoved = agentIndex
+        self.data.score += self.data.scoreChange
 
     def getLegalPacmanActions( self ):
         return self.getLegalActions( 0 )
@@ -174,7 +215,8 @@ class GameState:
         return self.data.capsules
 
     def getNumFood( self ):
-        return self.data.food.count()
+        "Returns the number of food pellets left, which is kept up to date as they are eaten"
+        return self.data.numFood
 
     def getFood(self):
         """
@@ -221,13 +263,13 @@ class GameState:
         """
         Generates a new state by copying information from its predecessor.
         """
-        if prevState != None: # Initial state
+        if prevState is not None: # Initial state
             self.data = GameStateData(prevState.data)
         else:
             self.data = GameStateData()
 
     def deepCopy( self ):
-        state = GameState( self )
+        state = GameState()
         state.data = self.data.deepCopy()
         return state
 
@@ -331,7 +373,7 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        return state.data.layout.getPossibleActions( state.getPacmanState().configuration )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action ):
@@ -346,7 +388,9 @@ class PacmanRules:
 
         # Update Configuration
         vector = Actions.directionToVector( action, PacmanRules.PACMAN_SPEED )
+        state.data.toggleAgent( 0 )
         pacmanState.configuration = pacmanState.configuration.generateSuccessor( vector )
+        state.data.toggleAgent( 0 )
 
         # Eat
         next = pacmanState.configuration.getPosition()
@@ -363,19 +407,22 @@ class PacmanRules:
             state.data.scoreChange += 10
             state.data.food = state.data.food.copy()
             state.data.food[x][y] = False
+            state.data.numFood -= 1
+            state.data.toggleFood( position )
             state.data._foodEaten = position
-            # TODO: cache numFood?
-            numFood = state.getNumFood()
-            if numFood == 0 and not state.data._lose:
+            if state.data.numFood == 0 and not state.data._lose:
                 state.data.scoreChange += 500
                 state.data._win = True
         # Eat capsule
         if( position in state.getCapsules() ):
-            state.data.capsules.remove( position )
+            state.data.capsules = [capsule for capsule in state.data.capsules if capsule != position]
+            state.data.toggleCapsule( position )
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
+                state.data.toggleAgent( index )
                 state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.toggleAgent( index )
     consume = staticmethod( consume )
 
 class GhostRules:
@@ -389,7 +436,7 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState( ghostIndex ).configuration
-        possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
+        possibleActions = state.data.layout.getPossibleActions( conf )
         reverse = Actions.reverseDirection( conf.direction )
         if Directions.STOP in possibleActions:
             possibleActions.remove( Directions.STOP )
@@ -408,13 +455,17 @@ class GhostRules:
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0: speed /= 2.0
         vector = Actions.directionToVector( action, speed )
+        state.data.toggleAgent( ghostIndex )
         ghostState.configuration = ghostState.configuration.generateSuccessor( vector )
+        state.data.toggleAgent( ghostIndex )
     applyAction = staticmethod( applyAction )
 
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            # Configurations are shared with earlier states, so replace it
+            configuration = ghostState.configuration
+            ghostState.configuration = Configuration( nearestPoint( configuration.pos ), configuration.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
     decrementTimer = staticmethod( decrementTimer )
 
@@ -436,9 +487,12 @@ class GhostRules:
     def collide( state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
             state.data.scoreChange += 200
+            state.data.toggleAgent( agentIndex )
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
-            # Added for first-person
+            state.data.toggleAgent( agentIndex )
+            # Added for first-person; the list is shared with earlier states
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
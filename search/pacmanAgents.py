@@ -42,8 +42,11 @@ class GreedyAgent(Agent):
         legal = state.getLegalPacmanActions()
         if Directions.STOP in legal: legal.remove(Directions.STOP)
 
-        successors = [(state.generateSuccessor(0, action), action) for action in legal]
-        scored = [(self.evaluationFunction(state), action) for state, action in successors]
+        scored = []
+        for action in legal:
+            record = state.apply(0, action)
+            scored.append((self.evaluationFunction(state), action))
+            state.undo(record)
         bestScore = max(scored)[0]
         bestActions = [pair[1] for pair in scored if pair[0] == bestScore]
         return random.choice(bestActions)
@@ -18,12 +18,24 @@ Pacman agents (in searchAgents.py).
 """
 
 import util
+import collections
+import heapq
+import json
+import multiprocessing
+import Queue
+import time
+import traceback
 
 class SearchProblem:
     """
     This class outlines the structure of a search problem, but doesn't implement
     any of the methods (in object-oriented terminology: an abstract class).
 
+    Problems may also define encode(state), returning a distinct non-negative
+    int for every state, and decode(code), turning it back into the state.
+    The searches then keep their closed sets, costs and nodes on the codes
+    (see getStateCodec).
+
     You do not need to change anything in this class, ever.
     """
 
@@ -72,22 +84,389 @@ def tinyMazeSearch(problem):
     w = Directions.WEST
     return  [s, s, w, s, w, w, s, w]
 
-def graphSearch(problem, priorityFn):
+def _identity(state):
+    return state
+
+def getStateCodec(problem):
+    """
+    Returns the problem's (encode, decode) pair, or a pair of functions that
+    leave states as they are if it has none.  Integer codes hash and compare
+    much faster than states holding a game.Grid, and a table of them holds no
+    references to the states, so the states themselves can be freed as soon
+    as they have been expanded.
+    """
+    if hasattr(problem, 'encode'):
+        return problem.encode, problem.decode
+    return _identity, _identity
+
+class SearchNodes:
+    """
+    A table of search nodes.  Rather than copying the whole path into every
+    frontier entry, each node only records the index of its parent node and the
+    action that led to it, so the path is rebuilt once, when a goal is found.
+    Nodes are plain integer indices into the parallel lists below.  The
+    searches store state codes rather than states (see getStateCodec).
+    """
+    def __init__(self):
+        self.states = []
+        self.parents = []
+        self.actions = []
+        self.costs = []
+        self.depths = []
+
+    def add(self, state, parent, action, cost, depth):
+        "Adds a node and returns its index"
+        self.states.append(state)
+        self.parents.append(parent)
+        self.actions.append(action)
+        self.costs.append(cost)
+        self.depths.append(depth)
+        return len(self.states) - 1
+
+    def getPath(self, node):
+        "Returns the list of actions leading from the root to the node"
+        parents, actions = self.parents, self.actions
+        path = []
+        while parents[node] is not None:
+            path.append(actions[node])
+            node = parents[node]
+        path.reverse()
+        return path
+
+    def getPathToRoot(self, node):
+        """
+        Returns the actions from the node up to the root, in that order.  In a
+        backward search, where each node's action leads from it to its parent,
+        that is the path from the node to the goal.
+        """
+        parents, actions = self.parents, self.actions
+        path = []
+        while parents[node] is not None:
+            path.append(actions[node])
+            node = parents[node]
+        return path
+
+class SearchStats:
+    """
+    What a single search did, as collected by searchWithStats:
+      expanded, generated    calls to getSuccessors and the successors returned
+      duplicates             pushes of states that had been pushed before
+      maxFrontier            the largest the frontier got
+      closed                 the number of states in the closed set at the end,
+                             or for breadthFirstSearch every state it has seen
+      successorTime, heuristicTime, queueTime
+                             seconds spent in getSuccessors (and
+                             getPredecessors), the heuristic and frontier
+                             pushes and pops
+      totalTime, pathCost, pathLength
+      winner                 the configuration that won a portfolioSearch
+
+    Numbers an algorithm does not keep track of are None.
+    """
+    FIELDS = ('algorithm', 'expanded', 'generated', 'duplicates', 'maxFrontier',
+              'closed', 'successorTime', 'heuristicTime', 'queueTime',
+              'totalTime', 'pathCost', 'pathLength', 'winner')
+
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self.expanded = self.generated = 0
+        self.duplicates = self.maxFrontier = self.closed = None
+        self.successorTime = 0.0
+        self.heuristicTime = self.queueTime = None
+        self.totalTime = self.pathCost = self.pathLength = None
+        self.winner = None
+        self.frontierSize = 0
+
+    def asDict(self):
+        return dict([(field, getattr(self, field)) for field in self.FIELDS])
+
+    def __str__(self):
+        return ', '.join(['%s: %s' % (field, getattr(self, field)) for field in self.FIELDS])
+
+statsHooks = []
+
+def addStatsHook(hook):
+    "Calls hook(stats) with the SearchStats of every searchWithStats from now on"
+    statsHooks.append(hook)
+
+def removeStatsHook(hook):
+    statsHooks.remove(hook)
+
+class JsonLinesStatsWriter:
+    """
+    A stats hook that appends every SearchStats to a file as a line of JSON,
+    together with the given labels, e.g. layout='trickySearch'.
+    """
+    def __init__(self, path, **labels):
+        self.path = path
+        self.labels = labels
+
+    def __call__(self, stats):
+        record = stats.asDict()
+        record.update(self.labels)
+        f = open(self.path, 'a')
+        try: f.write(json.dumps(record, sort_keys=True) + '\n')
+        finally: f.close()
+
+class StatsProblem:
+    """
+    Wraps a search problem to count and time its getSuccessors and
+    getPredecessors calls in a SearchStats, passing everything else, including
+    attribute assignments, through to the problem.  Search functions find the
+    stats as problem.searchStats (see getSearchStats).
+    """
+    def __init__(self, problem, stats):
+        self.__dict__['problem'] = problem
+        self.__dict__['searchStats'] = stats
+
+    def __getattr__(self, name):
+        if name == 'getPredecessors':
+            return self._timed(self.problem.getPredecessors)
+        return getattr(self.problem, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.problem, name, value)
+
+    def getSuccessors(self, state):
+        return self._timed(self.problem.getSuccessors)(state)
+
+    def _timed(self, expand):
+        stats = self.searchStats
+        def timedExpand(state):
+            startTime = time.time()
+            successors = expand(state)
+            stats.successorTime += time.time() - startTime
+            stats.expanded += 1
+            stats.generated += len(successors)
+            return successors
+        return timedExpand
+
+class StatsQueue:
+    "Wraps a frontier queue to time its pushes and pops and track its size"
+    def __init__(self, queue, stats):
+        self.queue = queue
+        self.stats = stats
+        stats.queueTime = stats.queueTime or 0.0
+        stats.maxFrontier = stats.maxFrontier or 0
+
+    def push(self, item, priority):
+        stats = self.stats
+        startTime = time.time()
+        self.queue.push(item, priority)
+        stats.queueTime += time.time() - startTime
+        stats.frontierSize += 1
+        if stats.frontierSize > stats.maxFrontier:
+            stats.maxFrontier = stats.frontierSize
+
+    def pop(self):
+        startTime = time.time()
+        item = self.queue.pop()
+        self.stats.queueTime += time.time() - startTime
+        self.stats.frontierSize -= 1
+        return item
+
+    def isEmpty(self):
+        return self.queue.isEmpty()
+
+def getSearchStats(problem):
+    "Returns the SearchStats being collected for problem, or None"
+    return getattr(problem, 'searchStats', None)
+
+def timeHeuristic(heuristic, problem):
+    "Returns heuristic timed in problem's SearchStats, or just heuristic"
+    stats = getSearchStats(problem)
+    if stats is None:
+        return heuristic
+    stats.heuristicTime = stats.heuristicTime or 0.0
+    def timedHeuristic(state, problem):
+        startTime = time.time()
+        value = heuristic(state, problem)
+        stats.heuristicTime += time.time() - startTime
+        return value
+    return timedHeuristic
+
+def recordNodes(stats, nodes, closed):
+    "Records the duplicate pushes in a SearchNodes table and the closed set size"
+    stats.duplicates = len(nodes.states) - len(set(nodes.states))
+    if closed is not None:
+        stats.closed = len(closed)
+
+def recordWorkerExpansions(stats, expanded):
+    "Records the expansions of a search that ran in other processes, which is all that is known"
+    stats.expanded = expanded
+    stats.generated = stats.successorTime = None
+
+def searchWithStats(searchFunction, problem, algorithm=None):
+    """
+    Returns searchFunction(problem) along with a SearchStats of the search,
+    which is also passed to every hook added with addStatsHook.
+
+    The search runs on a StatsProblem, so expansions and successor time are
+    always counted; the other numbers are filled in by the search functions
+    that track them.  Searches run in other processes (portfolioSearch and
+    hashDistributedAStarSearch) only report their expansions.
+    """
+    stats = SearchStats(algorithm or getattr(searchFunction, '__name__', str(searchFunction)))
+    startTime = time.time()
+    path = searchFunction(StatsProblem(problem, stats))
+    stats.totalTime = time.time() - startTime
+    if path is not None:
+        stats.pathCost = problem.getCostOfActions(path)
+        stats.pathLength = len(path)
+    for hook in statsHooks:
+        hook(stats)
+    return path, stats
+
+class SearchEvent(collections.namedtuple('SearchEvent', ['kind', 'state', 'cost', 'path'])):
+    """
+    What a stepping search just did: kind is 'expand' as it expands state,
+    reached at cost; then 'goal' once it pops a goal state, with the path to
+    it, or 'failure' if there is none.
+    """
+    __slots__ = ()
+
+class SteppingSearch:
+    """
+    Runs a search a little at a time, so that callers can watch it, pause it
+    or give up on it, rather than wait for it to finish.  events is an
+    iterator of SearchEvents, such as graphSearchSteps returns; e.g.
+      search = SteppingSearch(aStarSearchSteps(problem, heuristic))
+
+      step(n)           expands up to n more states; returns whether the
+                        search is over
+      run(deadline)     expands states until the search is over, or until the
+                        time.time() deadline passes; returns the path found,
+                        or None if there is none (yet)
+      cancel()          stops the search for good
+      for event in it   yields the events as the search runs
+
+    Once it is over, done is set, path holds the result and expanded counts
+    the states expanded.
+    """
+    def __init__(self, events):
+        self.events = iter(events)
+        self.done = False
+        self.cancelled = False
+        self.path = None
+        self.expanded = 0
+
+    def step(self, n=1):
+        for i in xrange(n):
+            if self.done:
+                break
+            self._advance()
+        return self.done
+
+    def run(self, deadline=None):
+        while not self.done and (deadline is None or time.time() < deadline):
+            self._advance()
+        return self.path
+
+    def cancel(self):
+        if not self.done and hasattr(self.events, 'close'):
+            self.events.close()
+        self.done = self.cancelled = True
+
+    def __iter__(self):
+        while not self.done:
+            event = self._advance()
+            if event is not None:
+                yield event
+
+    def _advance(self):
+        try:
+            event = self.events.next()
+        except StopIteration:
+            self.done = True
+            return None
+        if event.kind == 'expand':
+            self.expanded += 1
+        else:
+            self.done = True
+            self.path = event.path
+        return event
+
+def graphSearchSteps(problem, priorityFn, pruneDominated=False, reopen=False):
+    """
+    Expands nodes in order of priorityFn(state, depth, cumCost), lowest first,
+    breaking ties first-in-first-out.  This is a generator of SearchEvents: it
+    yields an 'expand' event before expanding each state, then a 'goal' event
+    with the list of actions to the first goal state popped off the frontier,
+    or a 'failure' event if there is none.  See graphSearch and SteppingSearch.
+
+    The frontier is a util.BucketQueue, so while every priority is a small
+    non-negative integer (unit step costs with an integer heuristic) pushes and
+    pops are constant time; any other priority switches it to a binary heap.
+
+    With pruneDominated, the cheapest known cost of every generated state is
+    tracked and a successor is only pushed if it improves on it; entries that
+    were improved upon after being pushed are skipped when popped.  This keeps
+    at most one live frontier entry per state, but it is only sound for
+    priorities that order a state's copies by cumCost (UCS and A*).
+
+    Expanded states are never expanded again unless reopen is set, in which case
+    a state that is reached more cheaply after its expansion is pushed again.
+    That keeps A* optimal with admissible but inconsistent heuristics.  reopen
+    implies pruneDominated.
+    """
+    encode, decode = getStateCodec(problem)
+    nodes = SearchNodes()
+    codes, costs, depths = nodes.states, nodes.costs, nodes.depths
     closed = set()
-    leaves = util.PriorityQueueWithFunction(priorityFn)
-    leaves.push((problem.getStartState(), [], 0))
+    bestCosts = {} if pruneDominated or reopen else None
+    leaves = util.BucketQueue()
+    stats = getSearchStats(problem)
+    if stats is not None:
+        leaves = StatsQueue(leaves, stats)
+    start = problem.getStartState()
+    startCode = encode(start)
+    if bestCosts is not None:
+        bestCosts[startCode] = 0
+    leaves.push(nodes.add(startCode, None, None, 0, 0), priorityFn(start, 0, 0))
     while not leaves.isEmpty():
-        state, path, cumCost = leaves.pop()
+        node = leaves.pop()
+        code, cumCost = codes[node], costs[node]
+        if bestCosts is not None and cumCost > bestCosts[code]:
+            continue
+        state = decode(code)
         if problem.isGoalState(state):
-            return path
-        elif state in closed:
+            if stats is not None:
+                recordNodes(stats, nodes, closed)
+            yield SearchEvent('goal', state, cumCost, nodes.getPath(node))
+            return
+        elif bestCosts is None and code in closed:
             continue
 
-        closed.add(state)
+        yield SearchEvent('expand', state, cumCost, None)
+        closed.add(code)
+        depth = depths[node] + 1
         for (successor, action, stepCost) in problem.getSuccessors(state):
-            leaves.push((successor, path + [action], cumCost + stepCost))
+            successorCost = cumCost + stepCost
+            successorCode = encode(successor)
+            if bestCosts is not None:
+                bestCost = bestCosts.get(successorCode)
+                if bestCost is not None and successorCost >= bestCost:
+                    continue
+                if successorCode in closed and not reopen:
+                    continue
+                bestCosts[successorCode] = successorCost
+            leaves.push(
+                nodes.add(successorCode, node, action, successorCost, depth),
+                priorityFn(successor, depth, successorCost),
+            )
 
-    return None
+    if stats is not None:
+        recordNodes(stats, nodes, closed)
+    yield SearchEvent('failure', None, None, None)
+
+def graphSearch(problem, priorityFn, pruneDominated=False, reopen=False):
+    """
+    Runs graphSearchSteps to the end and returns the list of actions to the
+    first goal state popped off the frontier, or None if there is none.
+    """
+    for event in graphSearchSteps(problem, priorityFn, pruneDominated, reopen):
+        if event.kind != 'expand':
+            return event.path
 
 def depthFirstSearch(problem):
     """
@@ -96,28 +475,155 @@ def depthFirstSearch(problem):
     Your search algorithm needs to return a list of actions that reaches the
     goal. Make sure to implement a graph search algorithm.
 
+    The frontier is a plain list used as a stack.  Successors are pushed in
+    reverse so that the first one is expanded first, which is the order a
+    depth-ordered priority queue with first-in-first-out ties would give.
+
     To get started, you might want to try some of these simple commands to
     understand the search problem that is being passed in:
     """
-    return graphSearch(
-        problem,
-        lambda (state, path, cumCost): -len(path),
-    )
+    encode, decode = getStateCodec(problem)
+    nodes = SearchNodes()
+    codes, costs, depths = nodes.states, nodes.costs, nodes.depths
+    closed = set()
+    stats = getSearchStats(problem)
+    if stats is not None:
+        stats.maxFrontier = 0
+    leaves = [nodes.add(encode(problem.getStartState()), None, None, 0, 0)]
+    while leaves:
+        if stats is not None:
+            stats.maxFrontier = max(stats.maxFrontier, len(leaves))
+        node = leaves.pop()
+        code = codes[node]
+        state = decode(code)
+        if problem.isGoalState(state):
+            if stats is not None:
+                recordNodes(stats, nodes, closed)
+            return nodes.getPath(node)
+        elif code in closed:
+            continue
 
-def breadthFirstSearch(problem):
-    """Search the shallowest nodes in the search tree first."""
-    return graphSearch(
-        problem,
-        lambda (state, path, cumCost): len(path),
-    )
+        closed.add(code)
+        cumCost, depth = costs[node], depths[node] + 1
+        for (successor, action, stepCost) in reversed(problem.getSuccessors(state)):
+            successorCode = encode(successor)
+            if successorCode not in closed:
+                leaves.append(nodes.add(successorCode, node, action, cumCost + stepCost, depth))
+
+    if stats is not None:
+        recordNodes(stats, nodes, closed)
+    return None
+
+def breadthFirstSearch(problem, goalTestOnGeneration=False):
+    """
+    Search the shallowest nodes in the search tree first.
+
+    The frontier is a collections.deque and every state is queued at most once.
+    States are goal-tested when they are popped, as in the other searches; with
+    goalTestOnGeneration they are tested as soon as they are generated instead,
+    which returns the same path without expanding the rest of the goal's layer.
+    """
+    encode, decode = getStateCodec(problem)
+    nodes = SearchNodes()
+    codes, costs, depths = nodes.states, nodes.costs, nodes.depths
+    start = problem.getStartState()
+    if goalTestOnGeneration and problem.isGoalState(start):
+        return []
+    seen = set([encode(start)])
+    stats = getSearchStats(problem)
+    if stats is not None:
+        stats.maxFrontier = 0
+    leaves = collections.deque([nodes.add(encode(start), None, None, 0, 0)])
+    while leaves:
+        if stats is not None:
+            stats.maxFrontier = max(stats.maxFrontier, len(leaves))
+        node = leaves.popleft()
+        state = decode(codes[node])
+        if not goalTestOnGeneration and problem.isGoalState(state):
+            if stats is not None:
+                recordNodes(stats, nodes, seen)
+            return nodes.getPath(node)
+
+        cumCost, depth = costs[node], depths[node] + 1
+        for (successor, action, stepCost) in problem.getSuccessors(state):
+            successorCode = encode(successor)
+            if successorCode in seen:
+                continue
+            seen.add(successorCode)
+            child = nodes.add(successorCode, node, action, cumCost + stepCost, depth)
+            if goalTestOnGeneration and problem.isGoalState(successor):
+                if stats is not None:
+                    recordNodes(stats, nodes, seen)
+                return nodes.getPath(child)
+            leaves.append(child)
+
+    if stats is not None:
+        recordNodes(stats, nodes, seen)
+    return None
 
 def uniformCostSearch(problem):
     """Search the node of least total cost first."""
-    return graphSearch(
+    return SteppingSearch(uniformCostSearchSteps(problem)).run()
+
+def uniformCostSearchSteps(problem):
+    "Returns the SearchEvents of uniformCostSearch (see SteppingSearch)"
+    return graphSearchSteps(
         problem,
-        lambda (state, path, cumCost): cumCost,
+        lambda state, depth, cumCost: cumCost,
+        pruneDominated=True,
     )
 
+def distanceMap(problem, targets=None):
+    """
+    Runs a single Dijkstra search out of the problem's start state, ignoring its
+    goal test, and returns a dict from states to the cost of the cheapest path
+    to them.  Without targets it holds every reachable state.  With a
+    collection of target states, the search stops as soon as all of them have
+    been settled and only their costs are returned; unreachable targets are
+    left out.  This replaces one search per target from the same source.  It
+    works on any problem, unlike layout.MazeDistances, which only knows the
+    positions of a layout's walls; searchAgents.mazeDistances falls back on it
+    when that table does not apply.
+
+    The frontier is a util.BucketQueue, so with unit step costs this costs no
+    more than a breadth-first search.
+    """
+    encode, decode = getStateCodec(problem)
+    start = encode(problem.getStartState())
+    distances = {start: 0}
+    settled = set()
+    remaining = None
+    if targets is not None:
+        remaining = set(encode(target) for target in targets)
+    leaves = util.BucketQueue()
+    leaves.push((0, start), 0)
+    while not leaves.isEmpty():
+        cumCost, code = leaves.pop()
+        if code in settled or cumCost > distances[code]:
+            continue
+        settled.add(code)
+        if remaining is not None:
+            remaining.discard(code)
+            if not remaining:
+                break
+
+        for (successor, action, stepCost) in problem.getSuccessors(decode(code)):
+            successorCost = cumCost + stepCost
+            successorCode = encode(successor)
+            bestCost = distances.get(successorCode)
+            if bestCost is None or successorCost < bestCost:
+                distances[successorCode] = successorCost
+                leaves.push((successorCost, successorCode), successorCost)
+
+    if targets is None:
+        return dict((decode(code), distances[code]) for code in settled)
+    targetDistances = {}
+    for target in targets:
+        code = encode(target)
+        if code in settled:
+            targetDistances[target] = distances[code]
+    return targetDistances
+
 def nullHeuristic(state, problem=None):
     """
     A heuristic function estimates the cost from the current state to the nearest
@@ -125,16 +631,966 @@ def nullHeuristic(state, problem=None):
     """
     return 0
 
-def aStarSearch(problem, heuristic=nullHeuristic):
-    """Search the node that has the lowest combined cost and heuristic first."""
-    return graphSearch(
+def getCachedHeuristic(heuristic, problem, cacheSize):
+    """
+    Returns heuristic wrapped in a util.LRUCache of cacheSize states.  Problems
+    with a heuristicInfo dictionary keep the cache in it, under
+    'heuristicCache', so that it outlives a single search and its hits and
+    misses can be read afterwards; it is replaced if it was made for another
+    heuristic or size.
+    """
+    info = getattr(problem, 'heuristicInfo', None)
+    cache = info.get('heuristicCache') if info is not None else None
+    if cache is None or cache.heuristic is not heuristic or cache.maxSize != cacheSize:
+        cache = util.LRUCache(cacheSize)
+        cache.heuristic = heuristic
+        if info is not None:
+            info['heuristicCache'] = cache
+
+    def cachedHeuristic(state, problem):
+        value = cache.get(state)
+        if value is None:
+            value = heuristic(state, problem)
+            cache.put(state, value)
+        return value
+    return cachedHeuristic
+
+def aStarSearch(problem, heuristic=nullHeuristic, reopen=False, heuristicCacheSize=0):
+    """
+    Search the node that has the lowest combined cost and heuristic first.
+
+    Set reopen for admissible heuristics that are not consistent, such as
+    searchAgents.nearestCornersManhattanHeuristic, so that states reached more
+    cheaply after being expanded are expanded again.
+
+    Set heuristicCacheSize to remember the heuristic values of that many
+    recently seen states (see getCachedHeuristic).  That only pays off for
+    expensive heuristics, like searchAgents.farthestFoodMazeHeuristic.
+    """
+    return SteppingSearch(aStarSearchSteps(problem, heuristic, reopen, heuristicCacheSize)).run()
+
+def aStarSearchSteps(problem, heuristic=nullHeuristic, reopen=False, heuristicCacheSize=0):
+    "Returns the SearchEvents of aStarSearch (see SteppingSearch)"
+    if heuristicCacheSize:
+        heuristic = getCachedHeuristic(heuristic, problem, int(heuristicCacheSize))
+    heuristic = timeHeuristic(heuristic, problem)
+    return graphSearchSteps(
         problem,
-        lambda (state, path, cumCost): cumCost + heuristic(state, problem),
+        lambda state, depth, cumCost: cumCost + heuristic(state, problem),
+        pruneDominated=True,
+        reopen=reopen,
     )
 
 
+def iterativeDeepeningAStarSearch(problem, heuristic=nullHeuristic, transpositionTableSize=0):
+    """
+    IDA*: a series of depth-first searches that each explore every path whose
+    cost plus heuristic stays within a bound, starting at the heuristic value
+    of the start state and raising the bound to the smallest value that was
+    cut off each time.  With an admissible heuristic the first goal found is
+    optimal.  It suits integer step costs; with real-valued costs each new
+    bound may only admit a handful of new nodes.
+
+    Only the current path is kept in memory, and states already on it are
+    skipped to avoid cycles.  With transpositionTableSize, up to that many
+    states also remember the cheapest cost they were reached at during the
+    current iteration, so states reached again at no lower cost are skipped.
+    """
+    heuristic = timeHeuristic(heuristic, problem)
+    start = problem.getStartState()
+    if problem.isGoalState(start):
+        return []
+    bound = heuristic(start, problem)
+    while True:
+        nextBound = float('inf')
+        table = {}
+        path, pathStates, pathCosts = [], [start], [0]
+        onPath = set(pathStates)
+        frames = [iter(problem.getSuccessors(start))]
+        while frames:
+            try:
+                (successor, action, stepCost) = frames[-1].next()
+            except StopIteration:
+                frames.pop()
+                onPath.remove(pathStates.pop())
+                pathCosts.pop()
+                if path:
+                    path.pop()
+                continue
+            if successor in onPath:
+                continue
+            cumCost = pathCosts[-1] + stepCost
+            f = cumCost + heuristic(successor, problem)
+            if f > bound:
+                nextBound = min(nextBound, f)
+                continue
+            if transpositionTableSize:
+                seenCost = table.get(successor)
+                if seenCost is not None and cumCost >= seenCost:
+                    continue
+                if seenCost is not None or len(table) < transpositionTableSize:
+                    table[successor] = cumCost
+            if problem.isGoalState(successor):
+                return path + [action]
+            path.append(action)
+            pathStates.append(successor)
+            pathCosts.append(cumCost)
+            onPath.add(successor)
+            frames.append(iter(problem.getSuccessors(successor)))
+        if nextBound == float('inf'):
+            return None
+        bound = nextBound
+
+def recursiveBestFirstSearch(problem, heuristic=nullHeuristic, transpositionTableSize=0):
+    """
+    RBFS: a best-first search that only keeps the current path and the
+    siblings of the nodes on it.  Each subtree is explored only while its
+    best value stays below that of the best alternative elsewhere; when it
+    backs off, the subtree's root remembers the smallest value found below
+    it, so it is resumed in the right order later.  With an admissible
+    heuristic the path found is optimal.
+
+    States already on the current path are skipped to avoid cycles.  With
+    transpositionTableSize, up to that many states also remember the
+    cheapest cost they have been reached at and the state they were reached
+    from, and successors reached at a higher cost, or at the same cost from a
+    different state, are skipped.  Re-expanding the same subtree is still
+    allowed.
+
+    The recursion is as deep as the solution is long.
+    """
+    heuristic = timeHeuristic(heuristic, problem)
+    infinity = float('inf')
+    start = problem.getStartState()
+    path = []
+    onPath = set([start])
+    table = {}
+
+    def search(state, cumCost, value, limit):
+        if problem.isGoalState(state):
+            return True, value
+        successors = []
+        for (successor, action, stepCost) in problem.getSuccessors(state):
+            if successor in onPath:
+                continue
+            successorCost = cumCost + stepCost
+            if transpositionTableSize:
+                seen = table.get(successor)
+                if seen is not None and (successorCost, state) != seen and successorCost >= seen[0]:
+                    continue
+                if seen is not None or len(table) < transpositionTableSize:
+                    table[successor] = (successorCost, state)
+            successorValue = max(successorCost + heuristic(successor, problem), value)
+            successors.append([successorValue, successorCost, successor, action])
+        if not successors:
+            return False, infinity
+
+        while True:
+            successors.sort(key=lambda entry: entry[0])
+            best = successors[0]
+            if best[0] > limit:
+                return False, best[0]
+            alternative = successors[1][0] if len(successors) > 1 else infinity
+            path.append(best[3])
+            onPath.add(best[2])
+            found, best[0] = search(best[2], best[1], best[0], min(limit, alternative))
+            if found:
+                return True, best[0]
+            path.pop()
+            onPath.remove(best[2])
+
+    found, value = search(start, 0, heuristic(start, problem), infinity)
+    return path if found else None
+
+def anytimeRepairingAStarSolutions(problem, heuristic=nullHeuristic, weight=2.5, weightStep=0.5, deadline=None):
+    """
+    ARA*: runs weighted A*, with priority cost + weight * heuristic, to find a
+    first solution quickly, then repeatedly lowers the weight by weightStep and
+    repairs the search to improve it, reusing the costs found so far instead of
+    starting over.  States whose cost improves after they were expanded are
+    set aside and only reconsidered once the weight changes.
+
+    This is a generator that yields (path, bound) every time it finishes a
+    weight, where the path costs at most bound times the optimal cost.  It
+    stops once the bound reaches 1, or once the time.time() deadline passes,
+    in which case it yields the best path found so far first.  If the deadline
+    passes before there is any path, it yields a quick one with an infinite
+    bound instead: problem.getGreedyPath(start) if the problem defines it (see
+    FoodSearchProblem), otherwise the first path found by a greedy search on
+    the heuristic alone, which never reopens a state.  The heuristic should be
+    consistent for the bounds to hold.
+    """
+    heuristic = timeHeuristic(heuristic, problem)
+    infinity = float('inf')
+    start = problem.getStartState()
+    if problem.isGoalState(start):
+        yield [], 1
+        return
+
+    # States are numbered so that the queue, which moves items around a lot,
+    # never has to hash them
+    ids, states, costs, estimates, parents = {}, [], [], [], []
+    def getId(state):
+        stateId = ids.get(state)
+        if stateId is None:
+            stateId = ids[state] = len(states)
+            states.append(state)
+            costs.append(infinity)
+            estimates.append(heuristic(state, problem))
+            parents.append(None)
+        return stateId
+
+    def getPath(stateId):
+        path = []
+        while parents[stateId] is not None:
+            stateId, action = parents[stateId]
+            path.append(action)
+        path.reverse()
+        return path
+
+    def getBound():
+        waiting = leaves.items() + list(inconsistent)
+        lowerBound = min([costs[stateId] + estimates[stateId] for stateId in waiting] or [infinity])
+        if lowerBound >= goalCost:
+            return 1
+        return goalCost / float(lowerBound) if lowerBound > 0 else infinity
+
+    startId = getId(start)
+    costs[startId] = 0
+    goal, goalCost = None, infinity
+    leaves = util.IndexedPriorityQueue()
+    leaves.push(startId, weight * estimates[startId])
+    closed, inconsistent = set(), set()
+    greedy = False
+    while True:
+        while not leaves.isEmpty() and leaves.getMinPriority() < goalCost:
+            if deadline is not None and not greedy and time.time() > deadline:
+                if goal is not None:
+                    yield getPath(goal), getBound()
+                    return
+                # Out of time with nothing to show: head straight for a goal
+                if hasattr(problem, 'getGreedyPath'):
+                    yield problem.getGreedyPath(start), infinity
+                    return
+                greedy = True
+                waiting = leaves.items()
+                leaves = util.IndexedPriorityQueue()
+                for stateId in waiting:
+                    leaves.push(stateId, estimates[stateId])
+            stateId = leaves.pop()
+            closed.add(stateId)
+            cumCost = costs[stateId]
+            for (successor, action, stepCost) in problem.getSuccessors(states[stateId]):
+                successorCost = cumCost + stepCost
+                successorId = getId(successor)
+                if successorCost >= costs[successorId]:
+                    continue
+                costs[successorId] = successorCost
+                parents[successorId] = (stateId, action)
+                if problem.isGoalState(successor):
+                    # Another goal may already be reached more cheaply
+                    if successorCost < goalCost:
+                        goal, goalCost = successorId, successorCost
+                elif successorId in closed:
+                    if not greedy:
+                        inconsistent.add(successorId)
+                elif greedy:
+                    leaves.update(successorId, estimates[successorId])
+                else:
+                    leaves.update(successorId, successorCost + weight * estimates[successorId])
+            if greedy and goal is not None:
+                break
+
+        if goal is None:
+            return
+        if greedy:
+            yield getPath(goal), infinity
+            return
+        bound = min(weight, getBound())
+        yield getPath(goal), bound
+        if bound <= 1 or (deadline is not None and time.time() > deadline):
+            return
+
+        weight = max(1, weight - weightStep)
+        waiting = leaves.items() + list(inconsistent)
+        leaves = util.IndexedPriorityQueue()
+        for stateId in waiting:
+            leaves.push(stateId, costs[stateId] + weight * estimates[stateId])
+        closed, inconsistent = set(), set()
+
+def anytimeRepairingAStarSearch(problem, heuristic=nullHeuristic, budget=None, weight=2.5, weightStep=0.5):
+    """
+    Returns the best path ARA* (see anytimeRepairingAStarSolutions) finds
+    within budget seconds, or the optimal path if there is no budget.  Once
+    the budget runs out without a solution it settles for a quick greedy one,
+    so it can still overrun by the time that takes.  On the command line, e.g.
+    -a fn=arastar,heuristic=foodHeuristic,budget=5
+    """
+    deadline = None
+    if budget is not None:
+        deadline = time.time() + budget
+    path = None
+    for (path, bound) in anytimeRepairingAStarSolutions(
+            problem, heuristic, weight, weightStep, deadline):
+        pass
+    return path
+
+def getPredecessorFunction(problem):
+    """
+    Returns a function from a state to its (predecessor, action, stepCost)
+    triples, where action leads from predecessor to state, or None if the
+    problem cannot be searched backwards.
+
+    Problems either define getPredecessors(state) themselves, or define
+    reverseAction(action) to declare that their moves are reversible and all
+    cost 1, in which case the predecessors of a state are its successors.
+    """
+    if hasattr(problem, 'getPredecessors'):
+        return problem.getPredecessors
+    if hasattr(problem, 'reverseAction'):
+        reverseAction = problem.reverseAction
+        return lambda state: [
+            (successor, reverseAction(action), stepCost)
+            for (successor, action, stepCost) in problem.getSuccessors(state)
+        ]
+    return None
+
+def bidirectionalSearch(problem, goal=None, unitCosts=None):
+    """
+    Search forwards from the start and backwards from the goal at the same
+    time, expanding whichever side has the cheaper frontier, and join the two
+    halves where they meet.  On open layouts this expands far fewer nodes than
+    a one-sided search, since each side only has to cover half the distance.
+
+    The problem must have a single goal state, which is problem.goal unless
+    given, and must support searching backwards (see getPredecessorFunction).
+    Each side is a uniform cost search, and a path is recorded whenever a
+    state is reached from both sides.  The cheapest one is returned once the
+    costs of the last nodes expanded on each side add up to at least its cost,
+    since any path through an unexpanded node must cost at least that much.
+    When every step costs 1 the sum may be one less than the path cost, because
+    all nodes one step beyond each side have already been generated.  That is
+    assumed for problems that declare reverseAction; set unitCosts to override.
+    """
+    if goal is None:
+        goal = problem.goal
+    getPredecessors = getPredecessorFunction(problem)
+    if getPredecessors is None:
+        raise Exception, 'bidirectionalSearch needs getPredecessors or reverseAction on the problem'
+    if unitCosts is None:
+        unitCosts = not hasattr(problem, 'getPredecessors')
+    slack = 1 if unitCosts else 0
+    start = problem.getStartState()
+    if start == goal:
+        return []
+
+    stats = getSearchStats(problem)
+    sides = []
+    for (root, expand) in ((start, problem.getSuccessors), (goal, getPredecessors)):
+        nodes = SearchNodes()
+        leaves = util.BucketQueue()
+        if stats is not None:
+            leaves = StatsQueue(leaves, stats)
+        leaves.push(nodes.add(root, None, None, 0, 0), 0)
+        sides.append((nodes, {root: 0}, leaves, expand))
+
+    bestCost, meeting = None, None
+    lastCosts = [0, 0]
+    while not sides[0][2].isEmpty() and not sides[1][2].isEmpty():
+        side = 0 if lastCosts[0] <= lastCosts[1] else 1
+        nodes, bestNodes, leaves, expand = sides[side]
+        otherNodes, otherBestNodes = sides[1 - side][:2]
+        states, costs, depths = nodes.states, nodes.costs, nodes.depths
+
+        node = leaves.pop()
+        state, cumCost = states[node], costs[node]
+        if node != bestNodes[state]:
+            continue
+        lastCosts[side] = cumCost
+        if bestCost is not None and lastCosts[0] + lastCosts[1] + slack >= bestCost:
+            break
+
+        depth = depths[node] + 1
+        for (neighbor, action, stepCost) in expand(state):
+            neighborCost = cumCost + stepCost
+            bestNode = bestNodes.get(neighbor)
+            if bestNode is not None and neighborCost >= costs[bestNode]:
+                continue
+            child = nodes.add(neighbor, node, action, neighborCost, depth)
+            bestNodes[neighbor] = child
+            leaves.push(child, neighborCost)
+
+            otherNode = otherBestNodes.get(neighbor)
+            if otherNode is not None:
+                pathCost = neighborCost + otherNodes.costs[otherNode]
+                if bestCost is None or pathCost < bestCost:
+                    bestCost = pathCost
+                    meeting = (child, otherNode) if side == 0 else (otherNode, child)
+
+    if stats is not None:
+        stats.duplicates = sum([len(nodes.states) - len(set(nodes.states)) for (nodes, _, _, _) in sides])
+    if meeting is None:
+        return None
+    forwardNode, backwardNode = meeting
+    return sides[0][0].getPath(forwardNode) + sides[1][0].getPathToRoot(backwardNode)
+
+
+def jumpPointSearch(problem, heuristic=nullHeuristic):
+    """
+    Jump Point Search: A* for problems whose states are (x,y) positions on
+    problem.walls, moving North, South, East or West at a cost of 1 per step,
+    like PositionSearchProblem with the default costFn.  It returns a path of
+    the same cost as aStarSearch, but expands far fewer states on open maps.
+
+    Of all the equally short paths between two cells, only those that never
+    turn from a horizontal move to a vertical one unless the wall behind them
+    forced it are considered.  Each expansion then jumps straight along a row
+    or column, without queueing the cells it passes, to the next cell where
+    such a path can turn, and only those jump points enter the frontier.
+    Vertical jumps also stop at any cell from which a horizontal jump finds a
+    jump point.  A jump point is keyed by its position and the direction it
+    was reached in, since that decides where it may go next.
+
+    problem.getSuccessors is never called, so the expanded jump points are
+    recorded in problem._expanded and the display bookkeeping directly, and
+    counted as the expansions and generations of any SearchStats.  The cells
+    a jump passes are compared with problem.goal when the problem has one;
+    only the jump points popped from the frontier go to problem.isGoalState.
+    """
+    from game import Directions
+    heuristic = timeHeuristic(heuristic, problem)
+    stats = getSearchStats(problem)
+    walls = problem.walls
+    # Scanned cells are only compared with the goal, so that isGoalState,
+    # which may draw on the display, is called on popped jump points alone
+    goal = getattr(problem, 'goal', None)
+    if goal is not None:
+        isGoalCell = lambda position: position == goal
+    else:
+        isGoalCell = problem.isGoalState
+    actions = {
+        (0, 1): Directions.NORTH,
+        (0, -1): Directions.SOUTH,
+        (1, 0): Directions.EAST,
+        (-1, 0): Directions.WEST,
+    }
+    allDirections = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+    visited = getattr(problem, '_visited', None)
+
+    def jumpHorizontally(x, y, dx):
+        while True:
+            x += dx
+            if walls[x][y]:
+                return None
+            if isGoalCell((x, y)):
+                return (x, y)
+            for dy in (1, -1):
+                if not walls[x][y + dy] and walls[x - dx][y + dy]:
+                    return (x, y)
+
+    def jump(x, y, dx, dy):
+        if dy == 0:
+            return jumpHorizontally(x, y, dx)
+        while True:
+            y += dy
+            if walls[x][y]:
+                return None
+            if isGoalCell((x, y)):
+                return (x, y)
+            if jumpHorizontally(x, y, 1) or jumpHorizontally(x, y, -1):
+                return (x, y)
+
+    def getDirections(x, y, direction):
+        if direction is None:
+            return allDirections
+        dx, dy = direction
+        if dx == 0:
+            return [direction, (1, 0), (-1, 0)]
+        # A horizontal move only turns where the cell behind it could not
+        return [direction] + [(0, ty) for ty in (1, -1)
+                              if not walls[x][y + ty] and walls[x - dx][y + ty]]
+
+    nodes = SearchNodes()
+    states, costs = nodes.states, nodes.costs
+    start = (problem.getStartState(), None)
+    bestCosts = {start: 0}
+    closed = set()
+    leaves = util.BucketQueue()
+    if stats is not None:
+        leaves = StatsQueue(leaves, stats)
+
+    def recordJumps():
+        recordNodes(stats, nodes, closed)
+        stats.expanded, stats.generated = len(closed), len(states) - 1
+
+    leaves.push(nodes.add(start, None, None, 0, 0), heuristic(start[0], problem))
+    while not leaves.isEmpty():
+        node = leaves.pop()
+        key, cumCost = states[node], costs[node]
+        if cumCost > bestCosts[key] or key in closed:
+            continue
+        position, direction = key
+        if problem.isGoalState(position):
+            if stats is not None:
+                recordJumps()
+            path = []
+            for (action, distance) in nodes.getPath(node):
+                path.extend([action] * distance)
+            return path
+
+        closed.add(key)
+        problem._expanded += 1
+        if visited is not None and position not in visited:
+            visited[position] = True
+            problem._visitedlist.append(position)
+
+        x, y = position
+        for (dx, dy) in getDirections(x, y, direction):
+            jumpPoint = jump(x, y, dx, dy)
+            if jumpPoint is None:
+                continue
+            distance = abs(jumpPoint[0] - x) + abs(jumpPoint[1] - y)
+            successor, successorCost = (jumpPoint, (dx, dy)), cumCost + distance
+            bestCost = bestCosts.get(successor)
+            if bestCost is not None and successorCost >= bestCost:
+                continue
+            bestCosts[successor] = successorCost
+            leaves.push(
+                nodes.add(successor, node, (actions[(dx, dy)], distance), successorCost, 0),
+                successorCost + heuristic(jumpPoint, problem),
+            )
+
+    if stats is not None:
+        recordJumps()
+    return None
+
+
+class DStarLite:
+    """
+    D* Lite: an incremental search for the cheapest path from a moving start
+    state to the nearest of a changing set of goal states.  It searches
+    backwards from the goals, keeping for every state it has reached its cost
+    to the nearest goal, g, and the cost its successors currently promise,
+    rhs.  When the start moves or the graph changes, only the states whose
+    costs actually change are expanded again, rather than starting over.
+
+    Tell it about every change before the next getPath:
+      moveStart(state)       when the start moves, e.g. once Pacman has moved
+      addGoal(state) and     when a state becomes, or stops being, a goal,
+      removeGoal(state)        e.g. when a food pellet is eaten
+      updateStates(states)   for states whose successors or step costs changed,
+                               e.g. a new wall and the states next to it
+
+    The problem must support searching backwards (see getPredecessorFunction)
+    and have positive step costs.  distanceFn(start, state) must never
+    overestimate the cost between two states, as util.manhattanDistance does
+    for positions; without it the search is an incremental uniform cost
+    search.
+    """
+    def __init__(self, problem, goals, distanceFn=None):
+        self.getSuccessors = problem.getSuccessors
+        self.getPredecessors = getPredecessorFunction(problem)
+        if self.getPredecessors is None:
+            raise Exception, 'DStarLite needs getPredecessors or reverseAction on the problem'
+        self.distanceFn = distanceFn or (lambda start, state: 0)
+        self.start = problem.getStartState()
+        self.goals = set()
+        self.costs = {}
+        self.lookaheads = {}
+        self.keyModifier = 0
+        self.leaves = util.IndexedPriorityQueue()
+        for goal in goals:
+            self.addGoal(goal)
+
+    def moveStart(self, state):
+        self.keyModifier += self.distanceFn(self.start, state)
+        self.start = state
+
+    def addGoal(self, state):
+        self.goals.add(state)
+        self._updateState(state)
+
+    def removeGoal(self, state):
+        self.goals.discard(state)
+        self._updateState(state)
+
+    def updateStates(self, states):
+        for state in states:
+            self._updateState(state)
+
+    def getCost(self):
+        "Returns the cost of the cheapest path from the start to a goal"
+        self._computeCosts()
+        return self.lookaheads.get(self.start, float('inf'))
+
+    def getPath(self):
+        """
+        Returns the actions of the cheapest path from the start to a goal, or
+        None if there is none.  Ties go to the first successor listed.
+        """
+        infinity = float('inf')
+        costs, goals = self.costs, self.goals
+        if self.getCost() == infinity:
+            return None
+        state = self.start
+        path = []
+        while state not in goals:
+            best, bestCost = None, infinity
+            for (successor, action, stepCost) in self.getSuccessors(state):
+                cost = stepCost + costs.get(successor, infinity)
+                if cost < bestCost:
+                    best, bestCost = (successor, action), cost
+            state, action = best
+            path.append(action)
+        return path
+
+    def _getKey(self, state, cost):
+        return (cost + self.distanceFn(self.start, state) + self.keyModifier, cost)
+
+    def _updateState(self, state):
+        "Recomputes the rhs value of state and queues it if it differs from g"
+        infinity = float('inf')
+        costs = self.costs
+        if state in self.goals:
+            lookahead = 0
+        else:
+            lookahead = infinity
+            for (successor, action, stepCost) in self.getSuccessors(state):
+                cost = stepCost + costs.get(successor, infinity)
+                if cost < lookahead:
+                    lookahead = cost
+        self.lookaheads[state] = lookahead
+        self._queueState(state)
+
+    def _queueState(self, state):
+        "Queues state if its g and rhs values differ, and dequeues it otherwise"
+        cost = self.costs.get(state, float('inf'))
+        lookahead = self.lookaheads[state]
+        if cost != lookahead:
+            self.leaves.push(state, self._getKey(state, min(cost, lookahead)))
+        elif state in self.leaves:
+            self.leaves.remove(state)
+
+    def _computeCosts(self):
+        "Expands inconsistent states until the start's cost is known"
+        infinity = float('inf')
+        costs, lookaheads, leaves = self.costs, self.lookaheads, self.leaves
+        start = self.start
+        while not leaves.isEmpty():
+            startCost = costs.get(start, infinity)
+            startLookahead = lookaheads.get(start, infinity)
+            oldKey = leaves.getMinPriority()
+            if oldKey >= self._getKey(start, min(startCost, startLookahead)) and startLookahead <= startCost:
+                break
+            state = leaves.peek()
+            cost, lookahead = costs.get(state, infinity), lookaheads[state]
+            newKey = self._getKey(state, min(cost, lookahead))
+            if oldKey < newKey:
+                # The start has moved since state was queued
+                leaves.push(state, newKey)
+            elif cost > lookahead:
+                costs[state] = lookahead
+                leaves.pop()
+                for (predecessor, action, stepCost) in self.getPredecessors(state):
+                    if lookahead + stepCost < lookaheads.get(predecessor, infinity):
+                        lookaheads[predecessor] = lookahead + stepCost
+                        self._queueState(predecessor)
+            else:
+                costs[state] = infinity
+                self._updateState(state)
+                for (predecessor, action, stepCost) in self.getPredecessors(state):
+                    self._updateState(predecessor)
+
+
+def _runConfiguration(results, index, searchFunction, problem):
+    "Runs in a portfolioSearch worker process and reports back to the parent"
+    if getattr(problem, 'visualize', False):
+        problem.visualize = False # Only the parent process may draw
+    startTime = time.time()
+    path, cost = None, None
+    try:
+        path = searchFunction(problem)
+        if path is not None:
+            cost = problem.getCostOfActions(path)
+    except Exception:
+        traceback.print_exc()
+        path = None
+    results.put((index, path, cost, time.time() - startTime, getattr(problem, '_expanded', None)))
+
+def portfolioSearch(problem, configurations, budget=None):
+    """
+    Runs several search configurations on the same problem at once, each in
+    its own process, and returns the path of the first one to finish with a
+    result it guarantees to be optimal.  The others are terminated then.
+
+    configurations is a list of (name, searchFunction, optimal) triples, where
+    searchFunction takes just the problem, and optimal says whether its paths
+    are always the cheapest (see optimalSearchFunctions).  If none of those
+    finishes within budget seconds of the start, the cheapest path found so
+    far is returned instead, or None if no configuration has found one yet.
+    None is also returned once every worker has exited without a path.
+    The winning configuration is printed and recorded as the winner of any
+    SearchStats, and its problem._expanded is copied over.
+
+    Workers are forked, so they share the problem as it was when the search
+    started.  They never draw expanded cells, since they do not own the
+    display.
+    """
+    results = multiprocessing.Queue()
+    workers = []
+    for (index, (name, searchFunction, optimal)) in enumerate(configurations):
+        worker = multiprocessing.Process(target=_runConfiguration, args=(results, index, searchFunction, problem))
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+
+    deadline = None if budget is None else time.time() + float(budget)
+    best, running, exited = None, len(workers), False
+    try:
+        while running:
+            # Wake up now and then to notice workers that died without a result
+            timeout = 0.1
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.time())
+                if timeout <= 0:
+                    break
+            try:
+                result = results.get(timeout=timeout)
+            except Queue.Empty:
+                if exited:
+                    break
+                # Results are flushed before a worker exits, so one more look
+                # at the queue finds anything the last ones sent
+                exited = not any([worker.is_alive() for worker in workers])
+                continue
+            running -= 1
+            (index, path, cost, elapsed, expanded) = result
+            if path is None:
+                continue
+            if best is None or cost < best[2]:
+                best = result
+            if configurations[index][2]:
+                best = result
+                break
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+    if best is None:
+        print('[portfolioSearch] no configuration found a path')
+        return None
+    (index, path, cost, elapsed, expanded) = best
+    print('[portfolioSearch] %s won with a path of cost %s in %.1f seconds' % (configurations[index][0], cost, elapsed))
+    stats = getSearchStats(problem)
+    if stats is not None:
+        stats.winner = configurations[index][0]
+    if expanded is not None:
+        problem._expanded = expanded
+        if stats is not None:
+            recordWorkerExpansions(stats, expanded)
+    return path
+
+
+def _runHashDistributedWorker(index, inboxes, masterInbox, problem, heuristic):
+    """
+    The body of one hashDistributedAStarSearch worker.  It owns the states that
+    hash to index, and runs A* on them with its own open and closed lists,
+    sending the successors it generates for other workers to their inboxes in
+    batches.  Nodes are numbered per worker, and a node refers to its parent by
+    (worker, number), so paths can be traced back across workers.
+    """
+    inbox = inboxes[index]
+    inbox.cancel_join_thread()
+    workerCount = len(inboxes)
+    infinity = float('inf')
+    ids, records = {}, [] # records[id] = [state, cumCost, estimate, parentRef, action]
+    leaves = [] # Heap of (cumCost + estimate, count, id, cumCost); stale entries are skipped
+    outboxes = [[] for i in xrange(workerCount)]
+    counts = {'sent': 0, 'received': 0, 'pushed': 0}
+    incumbent = infinity
+
+    def insert(state, cumCost, parentRef, action):
+        nodeId = ids.get(state)
+        if nodeId is None:
+            nodeId = ids[state] = len(records)
+            records.append([state, cumCost, heuristic(state, problem), parentRef, action])
+        elif cumCost < records[nodeId][1]:
+            records[nodeId][1:] = [cumCost, records[nodeId][2], parentRef, action]
+        else:
+            return
+        heapq.heappush(leaves, (cumCost + records[nodeId][2], counts['pushed'], nodeId, cumCost))
+        counts['pushed'] += 1
+
+    def hasWork():
+        while leaves and leaves[0][3] != records[leaves[0][2]][1]:
+            heapq.heappop(leaves)
+        return bool(leaves) and leaves[0][0] < incumbent
+
+    if hash(problem.getStartState()) % workerCount == index:
+        insert(problem.getStartState(), 0, None, None)
+    try:
+        while True:
+            block = not hasWork()
+            while True:
+                try:
+                    message = inbox.get(block)
+                except Queue.Empty:
+                    break
+                block = False
+                kind = message[0]
+                if kind == 'nodes':
+                    counts['received'] += 1
+                    for node in message[1]:
+                        insert(*node)
+                elif kind == 'incumbent':
+                    incumbent = min(incumbent, message[1])
+                elif kind == 'probe':
+                    masterInbox.put(('status', index, message[1],
+                                     (not hasWork(), counts['sent'], counts['received'],
+                                      getattr(problem, '_expanded', None))))
+                elif kind == 'parent':
+                    masterInbox.put(('parent', records[message[1]][3], records[message[1]][4]))
+                elif kind == 'stop':
+                    return
+
+            for i in xrange(64):
+                if not hasWork():
+                    break
+                (_, _, nodeId, cumCost) = heapq.heappop(leaves)
+                state = records[nodeId][0]
+                if problem.isGoalState(state):
+                    incumbent = cumCost
+                    masterInbox.put(('goal', cumCost, (index, nodeId)))
+                    continue
+                for (successor, action, stepCost) in problem.getSuccessors(state):
+                    owner = hash(successor) % workerCount
+                    if owner == index:
+                        insert(successor, cumCost + stepCost, (index, nodeId), action)
+                    else:
+                        outboxes[owner].append((successor, cumCost + stepCost, (index, nodeId), action))
+
+            for (owner, outbox) in enumerate(outboxes):
+                if outbox:
+                    inboxes[owner].put(('nodes', outbox))
+                    counts['sent'] += 1
+                    outboxes[owner] = []
+    except Exception:
+        masterInbox.put(('error', traceback.format_exc()))
+
+def hashDistributedAStarSearch(problem, heuristic=nullHeuristic, workerCount=None):
+    """
+    HDA*: A* spread over workerCount processes (one per CPU by default).  Each
+    state belongs to the worker that hash(state) picks, which alone keeps its
+    cost and expands it, so no state is ever searched twice; successors owned
+    by other workers are sent to them in batches.  It returns an optimal path
+    for any admissible heuristic, as states reached more cheaply are expanded
+    again.
+
+    Workers are forked, and states travel between them pickled, so states
+    must hash by value the same way in every process, as tuples and
+    game.Grid do.  Once a worker finds a goal, the others only expand nodes
+    that could lead to a cheaper one.
+
+    This process coordinates: it tells every worker about the cheapest goal
+    found, and detects termination by asking all of them, over and over, how
+    many batches they have sent and received.  The search is over once two
+    rounds in a row find every worker out of work, every batch received, and
+    no counter changed in between.  It then traces the path back through the
+    workers that own each node, and adds up their problem._expanded, if the
+    problem keeps one.
+    """
+    workerCount = int(workerCount or multiprocessing.cpu_count())
+    inboxes = [multiprocessing.Queue() for i in xrange(workerCount)]
+    masterInbox = multiprocessing.Queue()
+    workers = []
+    for index in xrange(workerCount):
+        worker = multiprocessing.Process(target=_runHashDistributedWorker,
+                                         args=(index, inboxes, masterInbox, problem, heuristic))
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+
+    def receive(kind):
+        "Returns the next message of the given kind, noting any goals found meanwhile"
+        while True:
+            message = masterInbox.get()
+            if message[0] == kind:
+                return message
+            if message[0] == 'goal' and message[1] < best[0]:
+                best[:] = message[1:]
+                for inbox in inboxes:
+                    inbox.put(('incumbent', message[1]))
+            elif message[0] == 'error':
+                raise Exception, 'hashDistributedAStarSearch worker failed:\n' + message[1]
+
+    best = [float('inf'), None]
+    try:
+        previous, probe = None, 0
+        while True:
+            probe += 1
+            for inbox in inboxes:
+                inbox.put(('probe', probe))
+            statuses = [None] * workerCount
+            while None in statuses:
+                (_, index, replyProbe, status) = receive('status')
+                if replyProbe == probe:
+                    statuses[index] = status
+            idle = all([status[0] for status in statuses])
+            sent = sum([status[1] for status in statuses])
+            received = sum([status[2] for status in statuses])
+            if idle and sent == received and statuses == previous:
+                break
+            previous = statuses
+            time.sleep(0.005)
+
+        expanded = None
+        if hasattr(problem, '_expanded'):
+            expanded = problem._expanded = sum([status[3] for status in statuses])
+        if getSearchStats(problem) is not None:
+            recordWorkerExpansions(getSearchStats(problem), expanded)
+        path, nodeRef = None, best[1]
+        if nodeRef is not None:
+            path = []
+            while True:
+                inboxes[nodeRef[0]].put(('parent', nodeRef[1]))
+                (_, nodeRef, action) = receive('parent')
+                if nodeRef is None:
+                    break
+                path.append(action)
+            path.reverse()
+    finally:
+        for inbox in inboxes:
+            inbox.put(('stop',))
+        for worker in workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+    return path
+
+
 # Abbreviations
 bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+bidirectional = bidirectionalSearch
+idastar = iterativeDeepeningAStarSearch
+rbfs = recursiveBestFirstSearch
+arastar = anytimeRepairingAStarSearch
+jps = jumpPointSearch
+hdastar = hashDistributedAStarSearch
+
+# Search functions that always return a cheapest path, given an admissible
+# heuristic (and, for breadthFirstSearch and jumpPointSearch, unit step costs)
+optimalSearchFunctions = set([
+    breadthFirstSearch,
+    uniformCostSearch,
+    aStarSearch,
+    iterativeDeepeningAStarSearch,
+    recursiveBestFirstSearch,
+    bidirectionalSearch,
+    jumpPointSearch,
+    hashDistributedAStarSearch,
+])
@@ -37,7 +37,9 @@ Good luck and happy searching!
 from game import Directions
 from game import Agent
 from game import Actions
+from game import gridFromInt
 from itertools import permutations
+import functools
 import util
 import time
 import random
@@ -58,6 +60,23 @@ class GoWestAgent(Agent):
 #       after you fill in parts of search.py          #
 #######################################################
 
+def parseSearchArgument(value):
+    """
+    Converts an -a argument from the command line, which is always a string,
+    to the bool, int or float it spells, e.g. 'False' to False and '1000' to
+    1000.  Anything else is returned unchanged.
+    """
+    if not isinstance(value, str):
+        return value
+    if value in ('True', 'False'):
+        return value == 'True'
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
 class SearchAgent(Agent):
     """
     This very general search agent finds a path using a supplied search
@@ -74,27 +93,43 @@ class SearchAgent(Agent):
 
     Note: You should NOT change any code in SearchAgent
     """
+    algorithm = None
+    statsWriter = None
 
-    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic', portfolio=None, portfolioBudget=None, statsFile=None, **searchArgs):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
 
-        # Get the search function from the name and heuristic
-        if fn not in dir(search):
-            raise AttributeError, fn + ' is not a search function in search.py.'
-        func = getattr(search, fn)
-        if 'heuristic' not in func.func_code.co_varnames:
-            print('[SearchAgent] using function ' + fn)
-            self.searchFunction = func
-        else:
-            if heuristic in globals().keys():
-                heur = globals()[heuristic]
-            elif heuristic in dir(search):
-                heur = getattr(search, heuristic)
+        # With statsFile, every search appends its search.SearchStats to it as JSON
+        self.algorithm = fn if portfolio is None else 'portfolio'
+        self.statsWriter = None
+        if statsFile is not None:
+            if portfolio is None:
+                labels = dict(fn=fn, heuristic=heuristic)
             else:
-                raise AttributeError, heuristic + ' is not a function in searchAgents.py or search.py.'
-            print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
-            # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+                labels = dict(portfolio=portfolio)
+            self.statsWriter = search.JsonLinesStatsWriter(statsFile, prob=prob, **labels)
+
+        if portfolio is None:
+            self.searchFunction = self.getSearchFunction(fn, heuristic, searchArgs)
+        else:
+            # A portfolio such as astar:foodHeuristic+arastar:foodHeuristic runs
+            # every fn:heuristic pair at once (see search.portfolioSearch).
+            # Each function is only passed the other arguments it takes.
+            configurations = []
+            unused = set(searchArgs)
+            for configuration in portfolio.split('+'):
+                fn, _, heuristic = configuration.partition(':')
+                if fn not in dir(search):
+                    raise AttributeError, fn + ' is not a search function in search.py.'
+                code = getattr(search, fn).func_code
+                args = dict((key, value) for (key, value) in searchArgs.items()
+                            if key in code.co_varnames[:code.co_argcount])
+                unused.difference_update(args)
+                func = self.getSearchFunction(fn, heuristic or 'nullHeuristic', args)
+                configurations.append((configuration, func, getattr(search, fn) in search.optimalSearchFunctions))
+            if unused:
+                raise AttributeError, ', '.join(sorted(unused)) + ' is not an argument of any function in the portfolio.'
+            self.searchFunction = lambda x: search.portfolioSearch(x, configurations, portfolioBudget)
 
         # Get the search problem type from the name
         if prob not in globals().keys() or not prob.endswith('Problem'):
@@ -102,6 +137,32 @@ class SearchAgent(Agent):
         self.searchType = globals()[prob]
         print('[SearchAgent] using problem type ' + prob)
 
+    def getSearchFunction(self, fn, heuristic, searchArgs):
+        "Returns the search function fn, given the heuristic if it takes one"
+        # Get the search function from the name and heuristic
+        if fn not in dir(search):
+            raise AttributeError, fn + ' is not a search function in search.py.'
+        func = getattr(search, fn)
+        takesHeuristic = 'heuristic' in func.func_code.co_varnames
+        if searchArgs:
+            # Any other agent arguments, such as budget=5, go to the search function
+            searchArgs = dict((key, parseSearchArgument(value)) for (key, value) in searchArgs.items())
+            print('[SearchAgent] passing %s to %s' % (searchArgs, fn))
+            func = functools.partial(func, **searchArgs)
+        if not takesHeuristic:
+            print('[SearchAgent] using function ' + fn)
+            return func
+
+        if heuristic in globals().keys():
+            heur = globals()[heuristic]
+        elif heuristic in dir(search):
+            heur = getattr(search, heuristic)
+        else:
+            raise AttributeError, heuristic + ' is not a function in searchAgents.py or search.py.'
+        print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
+        # Note: this bit of Python trickery combines the search algorithm and the heuristic
+        return lambda x: func(x, heuristic=heur)
+
     def registerInitialState(self, state):
         """
         This is the first time that the agent sees the layout of the game
@@ -114,10 +175,18 @@ class SearchAgent(Agent):
         if self.searchFunction == None: raise Exception, "No search function provided for SearchAgent"
         starttime = time.time()
         problem = self.searchType(state) # Makes a new search problem
-        self.actions  = self.searchFunction(problem) # Find a path
+        if self.statsWriter is None and not search.statsHooks:
+            self.actions  = self.searchFunction(problem) # Find a path
+        else:
+            self.actions, stats = search.searchWithStats(self.searchFunction, problem, self.algorithm)
+            if self.statsWriter is not None:
+                self.statsWriter(stats)
         totalCost = problem.getCostOfActions(self.actions)
         print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.time() - starttime))
         if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
+        cache = getattr(problem, 'heuristicInfo', {}).get('heuristicCache')
+        if cache is not None:
+            print('Heuristic cache: %d hits, %d misses' % (cache.hits, cache.misses))
 
     def getAction(self, state):
         """
@@ -155,6 +224,7 @@ class PositionSearchProblem(search.SearchProblem):
         goal: A position in the gameState
         """
         self.walls = gameState.getWalls()
+        self.layout = gameState.data.layout
         self.startState = gameState.getPacmanPosition()
         if start != None: self.startState = start
         self.goal = goal
@@ -195,14 +265,61 @@ class PositionSearchProblem(search.SearchProblem):
         """
 
         successors = []
+        for action, nextState in self.getMoves(state):
+            cost = self.costFn(nextState)
+            successors.append( ( nextState, action, cost) )
+
+        # Bookkeeping for display purposes
+        self._expanded += 1 # DO NOT CHANGE
+        if state not in self._visited:
+            self._visited[state] = True
+            self._visitedlist.append(state)
+
+        return successors
+
+    def getMoves(self, state):
+        """
+        Returns the (action, nextState) pairs of the moves out of state, in
+        North, South, East, West order.  They come from the layout's table
+        unless self.walls have changed since it was built, e.g. when walls are
+        added while search.DStarLite plans, in which case they are worked out
+        from self.walls.  Successors and predecessors both come from here.
+        """
+        if self.walls.packInt() == self.layout.actionTableWalls:
+            return self.layout.getMoves(state)
+        moves = []
+        x,y = state
         for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            x,y = state
             dx, dy = Actions.directionToVector(action)
             nextx, nexty = int(x + dx), int(y + dy)
             if not self.walls[nextx][nexty]:
-                nextState = (nextx, nexty)
-                cost = self.costFn(nextState)
-                successors.append( ( nextState, action, cost) )
+                moves.append( (action, (nextx, nexty)) )
+        return moves
+
+    def encode(self, state):
+        "Returns a distinct int for a position (see search.getStateCodec)"
+        x,y = state
+        return x * self.walls.height + y
+
+    def decode(self, code):
+        return divmod(code, self.walls.height)
+
+    def getPredecessors(self, state):
+        """
+        Returns predecessor states, the actions that lead from them to state,
+        and the cost of those actions, so that the problem can be searched
+        backwards from the goal (see search.bidirectionalSearch).  Moves are
+        reversible, so the predecessors are the cells getMoves leads to from
+        state, and stepping into state costs costFn(state).  Nothing steps into
+        a wall.
+        """
+
+        predecessors = []
+        cost = self.costFn(state)
+        x,y = state
+        if not self.walls[x][y]:
+            for action, prevState in self.getMoves(state):
+                predecessors.append( (prevState, Actions.reverseDirection(action), cost) )
 
         # Bookkeeping for display purposes
         self._expanded += 1 # DO NOT CHANGE
@@ -210,7 +327,7 @@ class PositionSearchProblem(search.SearchProblem):
             self._visited[state] = True
             self._visitedlist.append(state)
 
-        return successors
+        return predecessors
 
     def getCostOfActions(self, actions):
         """
@@ -280,6 +397,7 @@ class CornersProblem(search.SearchProblem):
         Stores the walls, pacman's starting position and corners.
         """
         self.walls = startingGameState.getWalls()
+        self.layout = startingGameState.data.layout
         self.startingPosition = startingGameState.getPacmanPosition()
         top, right = self.walls.height-2, self.walls.width-2
         self.corners = ((1,1), (1,top), (right, 1), (right, top))
@@ -318,18 +436,12 @@ class CornersProblem(search.SearchProblem):
         """
 
         successors = []
-        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            position, cornersLeft = state
-            x, y = position
-            dx, dy = Actions.directionToVector(action)
-            nextx, nexty = int(x + dx), int(y + dy)
-            if self.walls[nextx][nexty]:
-                continue
-
+        position, cornersLeft = state
+        for action, nextPosition in self.layout.getMoves(position):
             successors.append((
                 (
-                    (nextx, nexty),
-                    tuple(corner for corner in cornersLeft if (nextx, nexty) != corner)
+                    nextPosition,
+                    tuple(corner for corner in cornersLeft if nextPosition != corner)
                 ),
                 action,
                 1,
@@ -338,6 +450,26 @@ class CornersProblem(search.SearchProblem):
         self._expanded += 1 # DO NOT CHANGE
         return successors
 
+    def encode(self, state):
+        """
+        Returns a distinct int for a state (see search.getStateCodec): the
+        position, followed by a bit for each corner that is left.
+        """
+        (x, y), cornersLeft = state
+        code = x * self.walls.height + y
+        for corner in self.corners:
+            code = code * 2 + (corner in cornersLeft)
+        return code
+
+    def decode(self, code):
+        cornersLeft = []
+        for corner in reversed(self.corners):
+            if code & 1:
+                cornersLeft.append(corner)
+            code >>= 1
+        cornersLeft.reverse()
+        return (divmod(code, self.walls.height), tuple(cornersLeft))
+
     def getCostOfActions(self, actions):
         """
         Returns the cost of a particular sequence of actions.  If those actions
@@ -474,6 +606,7 @@ class FoodSearchProblem:
     def __init__(self, startingGameState):
         self.start = (startingGameState.getPacmanPosition(), startingGameState.getFood())
         self.walls = startingGameState.getWalls()
+        self.layout = startingGameState.data.layout
         self.startingGameState = startingGameState
         self._expanded = 0 # DO NOT CHANGE
         self.heuristicInfo = {} # A dictionary for the heuristic to store information
@@ -482,22 +615,69 @@ class FoodSearchProblem:
         return self.start
 
     def isGoalState(self, state):
-        return state[1].count() == 0
+        return state[1].packInt() == 0 # No food left
 
     def getSuccessors(self, state):
         "Returns successor states, the actions they require, and a cost of 1."
         successors = []
         self._expanded += 1 # DO NOT CHANGE
-        for direction in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            x,y = state[0]
-            dx, dy = Actions.directionToVector(direction)
-            nextx, nexty = int(x + dx), int(y + dy)
-            if not self.walls[nextx][nexty]:
-                nextFood = state[1].copy()
+        for direction, (nextx, nexty) in self.layout.getMoves(state[0]):
+            # Food grids are never changed once they are in a state, so a
+            # successor shares its parent's grid unless it eats a pellet
+            nextFood = state[1]
+            if nextFood[nextx][nexty]:
+                nextFood = nextFood.copy()
                 nextFood[nextx][nexty] = False
-                successors.append( ( ((nextx, nexty), nextFood), direction, 1) )
+            successors.append( ( ((nextx, nexty), nextFood), direction, 1) )
         return successors
 
+    def encode(self, state):
+        """
+        Returns a distinct int for a state (see search.getStateCodec): the food
+        grid as packed by Grid.packInt, followed by the position.
+        """
+        (x, y), foodGrid = state
+        return (foodGrid.packInt() * self.walls.width + x) * self.walls.height + y
+
+    def decode(self, code):
+        width, height = self.walls.width, self.walls.height
+        code, y = divmod(code, height)
+        foodBits, x = divmod(code, width)
+        return ((x, y), gridFromInt(width, height, foodBits))
+
+    def getGreedyPath(self, state):
+        """
+        Returns a path that eats all of the food left in state by walking to the
+        closest dot over and over, as ClosestDotSearchAgent does.  It is found
+        quickly but is seldom the shortest, so search.arastar falls back on it
+        when it runs out of time before it has a solution of its own.
+        """
+        position, foodGrid = state
+        food = set(foodGrid.asList())
+        path = []
+        while food:
+            # Breadth first search from position to the closest dot
+            parents = {position: None}
+            fringe = [position]
+            for current in fringe:
+                if current in food:
+                    break
+                for direction, nextPosition in self.layout.getMoves(current):
+                    if nextPosition not in parents:
+                        parents[nextPosition] = (current, direction)
+                        fringe.append(nextPosition)
+            else:
+                return None # Some food cannot be reached
+            food.discard(current)
+            position = current
+            segment = []
+            while parents[current] is not None:
+                current, direction = parents[current]
+                segment.append(direction)
+            segment.reverse()
+            path += segment
+        return path
+
     def getCostOfActions(self, actions):
         """Returns the cost of a particular sequence of actions.  If those actions
         include an illegal move, return 999999"""
@@ -565,7 +745,7 @@ def foodHeuristic(state, problem):
     # return farthestNFoodsAStarFurthestFoodManhattanHeuristic(state, problem, 6)  # 7,427 expansions in 20.6s
     # return farthestNFoodsAStarFurthestFoodManhattanHeuristic(state, problem, 7)  # 7,175 expansions in 52.0s
     # return farthestNFoodsAStarFurthestFoodManhattanHeuristic(state, problem, 8)  # 6,984 expansions in 137.1s
-    return farthestFoodMazeHeuristic(state, problem)  # 4,137 expansions in 28.1s
+    return farthestFoodMazeHeuristic(state, problem)  # 4,137 expansions in 0.9s
 
 def farthestFoodManhattanHeuristic(state, problem):
     position, foodGrid = state
@@ -627,10 +807,9 @@ def farthestNFoodsManhattanHeuristic(state, problem, n):
 
 def farthestNFoodsMazeManhattanHeuristic(state, problem, n):
     position, foodGrid = state
-    foodPositions = sorted(
-        foodGrid.asList(),
-        key=lambda foodPosition: mazeDistance(position, foodPosition, problem.startingGameState)
-    )[-n:]
+    foodPositions = foodGrid.asList()
+    distances = mazeDistances(position, foodPositions, problem.startingGameState)
+    foodPositions = sorted(foodPositions, key=distances.__getitem__)[-n:]
     if not foodPositions:
         return 0
 
@@ -647,8 +826,9 @@ def farthestFoodMazeHeuristic(state, problem):
     if not foodPositions:
         return 0
 
+    distances = problem.startingGameState.data.layout.getMazeDistances()
     return max((
-        mazeDistance(position, foodPosition, problem.startingGameState)
+        distances.getDistance(position, foodPosition)
         for foodPosition in foodPositions
     ))
 
@@ -713,7 +893,7 @@ class ClosestDotSearchAgent(SearchAgent):
     def registerInitialState(self, state):
         self.actions = []
         currentState = state
-        while(currentState.getFood().count() > 0):
+        while(currentState.getNumFood() > 0):
             nextPathSegment = self.findPathToClosestDot(currentState) # The missing piece
             self.actions += nextPathSegment
             for action in nextPathSegment:
@@ -736,7 +916,33 @@ class ClosestDotSearchAgent(SearchAgent):
         walls = gameState.getWalls()
         problem = AnyFoodSearchProblem(gameState)
 
-        return search.bfs(problem)
+        return search.bfs(problem, goalTestOnGeneration=True)
+
+class IncrementalClosestDotSearchAgent(ClosestDotSearchAgent):
+    """
+    Eats the closest dot over and over, like ClosestDotSearchAgent, but keeps a
+    single search.DStarLite planner from one dot to the next, telling it only
+    that Pacman moved and which dots are gone, rather than searching from
+    scratch every time.
+    """
+    def registerInitialState(self, state):
+        self.actions = []
+        currentState = state
+        problem = AnyFoodSearchProblem(state)
+        planner = search.DStarLite(problem, state.getFood().asList(), util.manhattanDistance)
+        while(currentState.getNumFood() > 0):
+            nextPathSegment = planner.getPath()
+            self.actions += nextPathSegment
+            eaten = []
+            for action in nextPathSegment:
+                currentState = currentState.generateSuccessor(0, action)
+                if currentState.getPacmanPosition() in planner.goals:
+                    eaten.append(currentState.getPacmanPosition())
+            planner.moveStart(currentState.getPacmanPosition())
+            for position in eaten:
+                planner.removeGoal(position)
+        self.actionIndex = 0
+        print 'Path found with cost %d.' % len(self.actions)
 
 def farthestIndividualFoodManhattanHeuristic(state, problem):
     position = state
@@ -771,6 +977,7 @@ class AnyFoodSearchProblem(PositionSearchProblem):
 
         # Store info for the PositionSearchProblem (no need to change this)
         self.walls = gameState.getWalls()
+        self.layout = gameState.data.layout
         self.startState = gameState.getPacmanPosition()
         self.costFn = lambda x: 1
         self._visited, self._visitedlist, self._expanded = {}, [], 0 # DO NOT CHANGE
@@ -785,9 +992,10 @@ class AnyFoodSearchProblem(PositionSearchProblem):
 
 def mazeDistance(point1, point2, gameState):
     """
-    Returns the maze distance between any two points, using the search functions
-    you have already built. The gameState can be any game state -- Pacman's
-    position in that state is ignored.
+    Returns the maze distance between any two points, looked up in the
+    all-pairs table of the game's layout (see layout.MazeDistances), which is
+    computed the first time it is needed. The gameState can be any game state
+    -- Pacman's position in that state is ignored.
 
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
@@ -798,5 +1006,26 @@ def mazeDistance(point1, point2, gameState):
     walls = gameState.getWalls()
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.aStarSearch(prob, heuristic=manhattanHeuristic))
+    return gameState.data.layout.getMazeDistances().getDistance(point1, point2)
+
+def mazeDistances(point, targets, gameState):
+    """
+    Returns a dict from each of targets to its maze distance from point.
+    Targets that cannot be reached are left out.  The distances come from the
+    layout's table unless the walls have changed since the layout was loaded,
+    in which case a single search.distanceMap out of point finds them.
+    """
+    x, y = point
+    walls = gameState.getWalls()
+    assert not walls[x][y], 'point is a wall: ' + str(point)
+    layout = gameState.data.layout
+    if walls.packInt() != layout.actionTableWalls:
+        prob = PositionSearchProblem(gameState, start=point, warn=False, visualize=False)
+        return search.distanceMap(prob, targets)
+    distances = layout.getMazeDistances()
+    targetDistances = {}
+    for target in targets:
+        distance = distances.getDistance(point, target)
+        if distance is not None:
+            targetDistances[target] = distance
+    return targetDistances
@@ -29,6 +29,7 @@
 import sys
 import inspect
 import heapq, random
+import collections
 import cStringIO
 
 
@@ -151,11 +152,11 @@ class Stack:
 class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
     def __init__(self):
-        self.list = []
+        self.list = collections.deque()
 
     def push(self,item):
         "Enqueue the 'item' into the queue"
-        self.list.insert(0,item)
+        self.list.appendleft(item)
 
     def pop(self):
         """
@@ -174,6 +175,18 @@ class PriorityQueue:
       has a priority associated with it and the client is usually interested
       in quick retrieval of the lowest-priority item in the queue. This
       data structure allows O(1) access to the lowest-priority item.
+
+      Items need not be hashable, and an item may be pushed any number of
+      times; each push is a separate entry.  Use IndexedPriorityQueue for a
+      fast update.
+
+      >>> q = PriorityQueue()
+      >>> q.push('a', 1); q.push('b', 3); q.push('a', 5)
+      >>> [q.pop() for i in range(3)]
+      ['a', 'b', 'a']
+      >>> q.push(((1, 2), ['North']), 3)
+      >>> q.pop()
+      ((1, 2), ['North'])
     """
     def  __init__(self):
         self.heap = []
@@ -206,6 +219,178 @@ class PriorityQueue:
         else:
             self.push(item, priority)
 
+class IndexedPriorityQueue:
+    """
+      A priority queue like PriorityQueue, but the binary heap is indexed: it
+      keeps a map from each item to its slot, so update and remove run in
+      O(log n) and contains in O(1).  Items must therefore be hashable, and
+      each item is queued at most once; pushing an item that is already queued
+      moves it to the new priority.  Items of equal priority are popped in the
+      order they were pushed.
+    """
+    def  __init__(self):
+        self.heap = []
+        self.index = {}
+        self.count = 0
+
+    def push(self, item, priority):
+        if item in self.index:
+            self.remove(item)
+        self.heap.append((priority, self.count, item))
+        self.count += 1
+        self._siftUp(len(self.heap) - 1)
+
+    def pop(self):
+        heap = self.heap
+        last = heap.pop()
+        if heap:
+            (_, _, item) = heap[0]
+            heap[0] = last
+            self._siftDown(0)
+        else:
+            (_, _, item) = last
+        del self.index[item]
+        return item
+
+    def isEmpty(self):
+        return len(self.heap) == 0
+
+    def peek(self):
+        "Returns the item pop would return, without popping it"
+        return self.heap[0][2]
+
+    def getMinPriority(self):
+        "Returns the priority of the item pop would return, without popping it"
+        return self.heap[0][0]
+
+    def items(self):
+        "Returns a list of the queued items, in no particular order"
+        return [item for (_, _, item) in self.heap]
+
+    def contains(self, item):
+        return item in self.index
+
+    __contains__ = contains
+
+    def remove(self, item):
+        "Removes 'item' from the queue; raises KeyError if it is not queued"
+        heap = self.heap
+        pos = self.index.pop(item)
+        last = heap.pop()
+        if pos < len(heap):
+            heap[pos] = last
+            self._siftUp(pos)
+            self._siftDown(self.index[last[2]])
+
+    def update(self, item, priority):
+        "Lowers the priority of 'item' if it is queued with a higher one, else pushes it"
+        if item not in self.index:
+            self.push(item, priority)
+            return
+        pos = self.index[item]
+        (p, c, i) = self.heap[pos]
+        if p <= priority:
+            return
+        self.heap[pos] = (priority, c, item)
+        self._siftUp(pos)
+
+    def _siftUp(self, pos):
+        "Moves the entry at pos towards the root until the heap is ordered"
+        heap, index = self.heap, self.index
+        entry = heap[pos]
+        while pos > 0:
+            parentPos = (pos - 1) >> 1
+            parent = heap[parentPos]
+            if not entry < parent:
+                break
+            heap[pos] = parent
+            index[parent[2]] = pos
+            pos = parentPos
+        heap[pos] = entry
+        index[entry[2]] = pos
+
+    def _siftDown(self, pos):
+        "Moves the entry at pos towards the leaves until the heap is ordered"
+        heap, index = self.heap, self.index
+        size = len(heap)
+        entry = heap[pos]
+        childPos = 2 * pos + 1
+        while childPos < size:
+            rightPos = childPos + 1
+            if rightPos < size and heap[rightPos] < heap[childPos]:
+                childPos = rightPos
+            child = heap[childPos]
+            if not child < entry:
+                break
+            heap[pos] = child
+            index[child[2]] = pos
+            pos = childPos
+            childPos = 2 * pos + 1
+        heap[pos] = entry
+        index[entry[2]] = pos
+
+class BucketQueue:
+    """
+      A priority queue for small non-negative integer priorities, such as the
+      path costs and heuristic values of the Pacman search problems where every
+      step costs 1 (Dial's algorithm).  Each priority has its own first-in-
+      first-out bucket, so push is O(1) and pop only has to scan forward past
+      empty buckets.  Items of equal priority are popped in the order they were
+      pushed, just like PriorityQueue.
+
+      As soon as any other priority is pushed (a float, a negative number or
+      one of MAX_PRIORITY or more), the queued items are moved into a
+      PriorityQueue, in order, and the queue behaves as a binary heap from then
+      on.  Items should be distinct and hashable in case that happens.
+    """
+    MAX_PRIORITY = 1 << 16
+
+    def  __init__(self):
+        self.buckets = []
+        self.minimum = 0
+        self.size = 0
+        self.heap = None
+
+    def push(self, item, priority):
+        if self.heap is not None:
+            self.heap.push(item, priority)
+            return
+        if type(priority) is not int or not 0 <= priority < self.MAX_PRIORITY:
+            self._moveToHeap()
+            self.heap.push(item, priority)
+            return
+        buckets = self.buckets
+        if priority >= len(buckets):
+            buckets.extend([collections.deque() for i in xrange(priority + 1 - len(buckets))])
+        buckets[priority].append(item)
+        if priority < self.minimum or self.size == 0:
+            self.minimum = priority
+        self.size += 1
+
+    def pop(self):
+        if self.heap is not None:
+            return self.heap.pop()
+        buckets, priority = self.buckets, self.minimum
+        while not buckets[priority]:
+            priority += 1
+        self.minimum = priority
+        self.size -= 1
+        return buckets[priority].popleft()
+
+    def isEmpty(self):
+        if self.heap is not None:
+            return self.heap.isEmpty()
+        return self.size == 0
+
+    def _moveToHeap(self):
+        heap = PriorityQueue()
+        for priority in xrange(self.minimum, len(self.buckets)):
+            for item in self.buckets[priority]:
+                heap.push(item, priority)
+        self.heap = heap
+        self.buckets = None
+        self.size = 0
+
 class PriorityQueueWithFunction(PriorityQueue):
     """
     Implements a priority queue with the same push/pop signature of the
@@ -223,6 +408,40 @@ class PriorityQueueWithFunction(PriorityQueue):
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
 
+class LRUCache:
+    """
+      A dictionary of at most maxSize entries that, when full, evicts the
+      entry that was least recently looked up or stored.  It counts the hits
+      and misses of get, so callers can tell whether caching pays off.
+    """
+    def  __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        "Returns the value stored for key, or default, marking key as recently used"
+        entries = self.entries
+        if key not in entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        value = entries.pop(key)
+        entries[key] = value
+        return value
+
+    def put(self, key, value):
+        entries = self.entries
+        if key in entries:
+            del entries[key]
+        elif len(entries) >= self.maxSize:
+            entries.popitem(last=False)
+        entries[key] = value
+
+    def __len__(self):
+        return len(self.entries)
+
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"
     return abs( xy1[0] - xy2[0] ) + abs( xy1[1] - xy2[1] )